@@ -45,4 +45,9 @@ def create_app():
     from app.controllers.attendance_controller import attendance_bp
     app.register_blueprint(attendance_bp, url_prefix='/attendance')
 
+    # Préchauffage des modèles de reconnaissance (optionnel)
+    if app.config.get("SCAN_WARMUP_ON_STARTUP"):
+        from app.services.recognition_service import RecognitionService
+        RecognitionService.start_warmup(app.config)
+
     return app
\ No newline at end of file
@@ -6,3 +6,61 @@ class Config:
         "mysql+pymysql://root:@localhost:3306/SystemPresence"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool partagé par les requêtes et les threads de scan ; connexions
+    # vérifiées et renouvelées avant le wait_timeout de MySQL
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800
+    }
+
+    # Service de reconnaissance dans un processus séparé
+    # (python -m app.services.recognition_daemon) ; None = scan dans le worker web
+    RECOGNITION_DAEMON_URL = None  # ex. "http://127.0.0.1:5055"
+    RECOGNITION_DAEMON_TIMEOUT = 5
+
+    # Scans simultanés : threads d'inférence partagés par toutes les sessions
+    # (servies à tour de rôle)
+    SCAN_INFERENCE_WORKERS = 1
+    # Inférence dans N processus séparés (0 = dans le processus du scan) ;
+    # frames transmises par un anneau de mémoire partagée de N slots.
+    # Threads TensorFlow/OpenCV par processus : None = cœurs / processus
+    SCAN_INFERENCE_PROCESSES = 0
+    SCAN_INFERENCE_THREADS_PER_WORKER = None
+    SCAN_FRAME_RING_SLOTS = 8
+
+    # Embeddings de toutes les salles regroupés : batch envoyé dès N visages
+    # ou après N ms d'attente
+    SCAN_BATCH_MAX_SIZE = 32
+    SCAN_BATCH_MAX_WAIT_MS = 20
+
+    # Scan : préchauffage des modèles (yolov8 + ArcFace) au démarrage de
+    # l'application, en arrière-plan (voir "models_ready" dans /scan/status)
+    SCAN_WARMUP_ON_STARTUP = False
+
+    # Scan : mode sans fenêtre OpenCV (serveur sans écran) et aperçu MJPEG (/scan/stream)
+    SCAN_HEADLESS = False
+    SCAN_STREAM_FPS = 10
+    SCAN_STREAM_JPEG_QUALITY = 70
+    # Scan : dessin de l'aperçu ("full", "minimal" sans coins ni repères,
+    # "off" sans aucun dessin pour les serveurs headless et les benchmarks)
+    SCAN_RENDER_LEVEL = "full"
+
+    # Scan : source de capture par défaut de /scan/start (index de caméra,
+    # URL rtsp:// ou http://, vidéo, dossier d'images, "synthetic") ;
+    # None = première caméra locale libre
+    SCAN_DEFAULT_SOURCE = None
+    # Sources acceptées depuis /scan/start en plus des caméras locales :
+    # vidéos / dossiers d'images sous SCAN_SOURCE_ROOT (None = aucun) et
+    # flux réseau listés dans SCAN_ALLOWED_STREAMS (URL ou préfixe)
+    SCAN_SOURCE_ROOT = None
+    SCAN_ALLOWED_STREAMS = []
+
+    # Scan : écriture groupée des présences (toutes les N ms ou tous les N étudiants)
+    SCAN_PRESENCE_FLUSH_MS = 500
+    SCAN_PRESENCE_FLUSH_SIZE = 20
+
+    # Scan : recherche dans toute la galerie si un visage ne correspond à aucun
+    # étudiant de la filière du cours
+    SCAN_FULL_GALLERY_FALLBACK = True
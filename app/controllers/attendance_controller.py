@@ -384,6 +384,48 @@ def bilan_etudiant_detail(etudiant_id):
         return render_template("department_head/error.html", message=str(e))
 
 
+# ========================
+# PERFORMANCES DES SCANS
+# ========================
+@attendance_bp.route("/performances-scan", methods=["GET"])
+@login_required
+@head_required
+def performances_scan():
+    """Débit et latences des scans de reconnaissance, par date et par machine"""
+    try:
+        from app.services.scan_run_service import ScanRunService
+
+        filiere = request.args.get('filiere', '')
+        date_debut_str = request.args.get('date_debut', '')
+        date_fin_str = request.args.get('date_fin', '')
+
+        # Par défaut : les 30 derniers jours
+        today = datetime.now()
+        if not date_debut_str:
+            date_debut_str = (today - timedelta(days=30)).strftime('%Y-%m-%d')
+        if not date_fin_str:
+            date_fin_str = today.strftime('%Y-%m-%d')
+        date_debut = datetime.strptime(date_debut_str, '%Y-%m-%d')
+        date_fin = datetime.strptime(date_fin_str, '%Y-%m-%d') + timedelta(days=1)
+
+        performance = ScanRunService.get_performance_data(
+            filiere=filiere,
+            date_debut=date_debut,
+            date_fin=date_fin
+        )
+
+        return render_template("department_head/scan_runs.html",
+                               performance=performance,
+                               filieres=AttendanceService.get_filieres_disponibles(),
+                               selected_filiere=filiere,
+                               date_debut=date_debut_str,
+                               date_fin=date_fin_str)
+
+    except Exception as e:
+        print(f"[ERROR] Erreur performances scan: {str(e)}")
+        return render_template("department_head/error.html", message=str(e))
+
+
 # ========================
 # EXPORT EXCEL
 # ========================
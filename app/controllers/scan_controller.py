@@ -1,18 +1,26 @@
 # app/controllers/scan_controller.py
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request, current_app
-import threading
+from flask import Blueprint, jsonify, request, current_app, Response, session
 import logging
-from app.services.facial_recognition import run_face_scan_with_context, stop_scan
+from app.services.capture_sources import restrict_source
+from app.services.scan_backend import get_scan_backend, RecognitionUnavailable
+from app.services.scan_metrics import to_prometheus
+from app.services.scan_stream import BOUNDARY
 
 scan_bp = Blueprint("scan", __name__)
-scan_thread = None
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
 
+@scan_bp.before_request
+def require_login():
+    """Toutes les routes du scan (aperçu compris) sont réservées aux utilisateurs connectés."""
+    if "user_id" not in session:
+        return jsonify({"error": "Authentification requise"}), 401
+
+
 @scan_bp.route("/start", methods=["POST"])
 def start_scan():
     try:
@@ -99,20 +107,38 @@ def start_scan():
         if cours_session_id <= 0:
             return jsonify({"error": "cours_session_id doit être un nombre positif"}), 400
 
-        global scan_thread
+        # Mode sans fenêtre OpenCV (optionnel, sinon valeur de SCAN_HEADLESS)
+        headless = data.get("headless")
+        if headless is not None and not isinstance(headless, bool):
+            return jsonify({"error": "headless doit être un booléen"}), 400
 
-        # Vérifier si un scan est déjà en cours
-        if scan_thread and scan_thread.is_alive():
-            logger.warning("Tentative de démarrage alors qu'un scan est déjà en cours")
-            return jsonify({"error": "Un scan est déjà en cours"}), 400
+        # Source de capture : index de caméra, URL RTSP/HTTP, vidéo, dossier
+        # d'images ou "synthetic" ("camera" accepté pour compatibilité).
+        # Sinon SCAN_DEFAULT_SOURCE, puis la première caméra libre.
+        # Vidéos / dossiers limités à SCAN_SOURCE_ROOT, flux à SCAN_ALLOWED_STREAMS
+        source = data.get("source", data.get("camera"))
+        if source is not None and (isinstance(source, bool) or not isinstance(source, (int, str))):
+            return jsonify({"error": "source doit être un index de caméra ou une chaîne"}), 400
+        if source is None:
+            source = current_app.config.get("SCAN_DEFAULT_SOURCE")
+        else:
+            try:
+                source = restrict_source(source, current_app.config.get("SCAN_SOURCE_ROOT"),
+                                         current_app.config.get("SCAN_ALLOWED_STREAMS"))
+            except ValueError as e:
+                logger.warning(f"Source refusée: {source} ({e})")
+                return jsonify({"error": str(e)}), 400
 
-        # Démarrer le scan dans un thread séparé avec contexte
-        scan_thread = threading.Thread(
-            target=run_face_scan_with_context,
-            args=(cours_session_id,),
-            daemon=True
+        # Service de reconnaissance séparé (RECOGNITION_DAEMON_URL) ou thread
+        # local avec l'application en cours (même moteur SQLAlchemy et même pool).
+        # Plusieurs sessions de cours peuvent être scannées en parallèle.
+        backend = get_scan_backend(current_app.config)
+        started, error = backend.start(
+            cours_session_id, headless, current_app._get_current_object(), source
         )
-        scan_thread.start()
+        if not started:
+            logger.warning(f"Démarrage refusé: {error}")
+            return jsonify({"error": error}), 400
 
         logger.info(f" Scan démarré pour la session {cours_session_id}")
         logger.info("=== FIN START SCAN ===")
@@ -125,6 +151,10 @@ def start_scan():
             "timestamp": datetime.now().isoformat()
         }), 200
 
+    except RecognitionUnavailable as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 503
+
     except Exception as e:
         logger.error(f" Erreur inattendue dans start_scan: {str(e)}", exc_info=True)
         return jsonify({
@@ -137,10 +167,34 @@ def start_scan():
 
 @scan_bp.route("/stop", methods=["POST"])
 def stop_scan_route():
+    """Arrête tous les scans (ou celui de cours_session_id dans le JSON)."""
+    try:
+        data = request.get_json(silent=True) or {}
+        cours_session_id = data.get("cours_session_id")
+        stopped = get_scan_backend(current_app.config).stop(
+            int(cours_session_id) if cours_session_id is not None else None
+        )
+        logger.info(f"{stopped} scan(s) arrêté(s)")
+        return jsonify({"message": "Scan arrêté", "stopped": stopped}), 200
+    except (ValueError, TypeError):
+        return jsonify({"error": "cours_session_id doit être un nombre valide"}), 400
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erreur lors de l'arrêt: {str(e)}")
+        return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
+
+
+@scan_bp.route("/<int:cours_session_id>/stop", methods=["POST"])
+def stop_session_scan(cours_session_id):
     try:
-        stop_scan()
-        logger.info("Scan arrêté")
-        return jsonify({"message": "Scan arrêté"}), 200
+        stopped = get_scan_backend(current_app.config).stop(cours_session_id)
+        if not stopped:
+            return jsonify({"error": f"Aucun scan en cours pour la session {cours_session_id}"}), 404
+        logger.info(f"Scan de la session {cours_session_id} arrêté")
+        return jsonify({"message": "Scan arrêté", "cours_session_id": cours_session_id}), 200
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         logger.error(f"Erreur lors de l'arrêt: {str(e)}")
         return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
@@ -148,26 +202,105 @@ def stop_scan_route():
 
 @scan_bp.route("/status", methods=["GET"])
 def scan_status():
+    """Vue d'ensemble : dernière session démarrée + liste de toutes les sessions."""
     try:
-        from app.services.facial_recognition import _scan_running, _detected_students
-        return jsonify({
-            "running": _scan_running,
-            "detected_count": len(_detected_students),
-            "detected_students": list(_detected_students)
-        }), 200
+        return jsonify(get_scan_backend(current_app.config).status()), 200
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erreur statut: {str(e)}")
+        return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
+
+
+@scan_bp.route("/<int:cours_session_id>/status", methods=["GET"])
+def session_scan_status(cours_session_id):
+    try:
+        status = get_scan_backend(current_app.config).status(cours_session_id)
+        if status is None:
+            return jsonify({"error": f"Aucun scan pour la session {cours_session_id}"}), 404
+        return jsonify(status), 200
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         logger.error(f"Erreur statut: {str(e)}")
         return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
 
 
+def _stream_response(cours_session_id=None):
+    try:
+        frames = get_scan_backend(current_app.config).stream(cours_session_id)
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    if frames is None:
+        return jsonify({"error": "Aucun scan pour cette session"}), 404
+    return Response(
+        frames,
+        mimetype=f"multipart/x-mixed-replace; boundary={BOUNDARY}",
+        headers={"Cache-Control": "no-cache, no-store"}
+    )
+
+
+@scan_bp.route("/stream", methods=["GET"])
+def scan_stream():
+    """Aperçu MJPEG des frames annotées du dernier scan démarré."""
+    return _stream_response()
+
+
+@scan_bp.route("/<int:cours_session_id>/stream", methods=["GET"])
+def session_scan_stream(cours_session_id):
+    """Aperçu MJPEG du scan d'une session de cours."""
+    return _stream_response(cours_session_id)
+
+
+@scan_bp.route("/events", methods=["GET"])
+def scan_events_route():
+    """
+    Évènements du scan après le numéro since (début, présences, fin).
+    timeout : attente max en secondes si aucun nouvel évènement.
+    """
+    try:
+        since = request.args.get("since", 0, type=int)
+        timeout = min(request.args.get("timeout", 0, type=float), 30)
+        return jsonify(get_scan_backend(current_app.config).events(since, timeout)), 200
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erreur évènements: {str(e)}")
+        return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
+
+
+@scan_bp.route("/metrics", methods=["GET"])
+def scan_metrics_route():
+    """
+    Durées par étape (histogrammes) et compteurs des scans.
+    format=prometheus : format texte d'exposition Prometheus, sinon JSON.
+    """
+    try:
+        snapshot = get_scan_backend(current_app.config).metrics()
+        if request.args.get("format") == "prometheus":
+            return Response(to_prometheus(snapshot), mimetype="text/plain; version=0.0.4")
+        return jsonify(snapshot), 200
+    except RecognitionUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        logger.error(f"Erreur métriques: {str(e)}")
+        return jsonify({"error": f"Erreur interne: {str(e)}"}), 500
+
+
 # Route de test
 @scan_bp.route("/test", methods=["GET"])
 def test():
     return jsonify({
         "message": "Scan API fonctionne",
         "endpoints": {
-            "/start": "POST - Démarrer scan",
-            "/stop": "POST - Arrêter scan",
-            "/status": "GET - Statut scan"
+            "/start": "POST - Démarrer scan (cours_session_id, headless, source)",
+            "/stop": "POST - Arrêter tous les scans",
+            "/status": "GET - Statut des scans",
+            "/stream": "GET - Aperçu MJPEG du dernier scan",
+            "/<id>/stop": "POST - Arrêter le scan d'une session",
+            "/<id>/status": "GET - Statut du scan d'une session",
+            "/<id>/stream": "GET - Aperçu MJPEG du scan d'une session",
+            "/events": "GET - Évènements du scan (since, timeout)",
+            "/metrics": "GET - Durées par étape et compteurs (format=prometheus)"
         }
     }), 200
\ No newline at end of file
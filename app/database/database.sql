@@ -67,6 +67,7 @@ CREATE TABLE presence (
     etudiant_id INT NOT NULL,
     cours_session_id INT NOT NULL,
     statut ENUM('P','A') NOT NULL, -- P = présent, A = absent
+    CONSTRAINT uq_presence_etudiant_session UNIQUE (etudiant_id, cours_session_id),
     CONSTRAINT fk_presence_etudiant
         FOREIGN KEY (etudiant_id) REFERENCES etudiant(id)
         ON UPDATE CASCADE ON DELETE CASCADE,
@@ -104,6 +105,43 @@ CREATE TABLE profil (
         ON UPDATE CASCADE ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
+-- TABLE SCAN_RUN (un rapport par scan de reconnaissance, écrit à la fin du scan)
+CREATE TABLE scan_run (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cours_session_id INT NOT NULL,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NOT NULL,
+    source VARCHAR(255) NULL,          -- caméra, flux ou vidéo
+    host VARCHAR(100) NULL,            -- machine qui a exécuté le scan
+    frames_captured INT NOT NULL DEFAULT 0,
+    frames_analyzed INT NOT NULL DEFAULT 0,
+    frames_dropped INT NOT NULL DEFAULT 0,
+    capture_fps FLOAT NULL,
+    faces_seen INT NOT NULL DEFAULT 0,
+    faces_per_frame FLOAT NULL,
+    faces_recognized INT NOT NULL DEFAULT 0,
+    faces_unknown INT NOT NULL DEFAULT 0,
+    students_recorded INT NOT NULL DEFAULT 0,
+    capture_mean_ms FLOAT NULL,
+    capture_p95_ms FLOAT NULL,
+    detect_mean_ms FLOAT NULL,
+    detect_p95_ms FLOAT NULL,
+    embed_mean_ms FLOAT NULL,
+    embed_p95_ms FLOAT NULL,
+    match_mean_ms FLOAT NULL,
+    match_p95_ms FLOAT NULL,
+    persist_mean_ms FLOAT NULL,        -- écriture des présences (par lot)
+    persist_p95_ms FLOAT NULL,
+    render_mean_ms FLOAT NULL,         -- dessin de l'aperçu
+    render_p95_ms FLOAT NULL,
+    end_to_end_mean_ms FLOAT NULL,
+    end_to_end_p95_ms FLOAT NULL,
+    INDEX idx_scan_run_started (started_at),
+    CONSTRAINT fk_scan_run_session
+        FOREIGN KEY (cours_session_id) REFERENCES cours_session(id)
+        ON UPDATE CASCADE ON DELETE CASCADE
+) ENGINE=InnoDB;
+
 
 USE SystemPresence;
 
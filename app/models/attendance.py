@@ -6,6 +6,10 @@ from sqlalchemy.orm import relationship
 
 class PresenceModel(db.Model):
     __tablename__ = 'presence'
+    # Une seule présence par étudiant et par séance (upsert du PresenceWriter)
+    __table_args__ = (
+        db.UniqueConstraint('etudiant_id', 'cours_session_id', name='uq_presence_etudiant_session'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     etudiant_id = db.Column(db.Integer, db.ForeignKey('etudiant.id'), nullable=False)
@@ -0,0 +1,76 @@
+# app/models/scan_run.py
+from app.database.connDB import db
+from sqlalchemy.orm import relationship
+
+# Étapes dont la durée moyenne et le p95 sont conservés
+SCAN_RUN_STAGES = ("capture", "detect", "embed", "match", "persist", "render", "end_to_end")
+
+
+class ScanRunModel(db.Model):
+    """Rapport d'un scan de reconnaissance (débit et latences), écrit à la fin du scan."""
+    __tablename__ = "scan_run"
+
+    id = db.Column(db.Integer, primary_key=True)
+    cours_session_id = db.Column(
+        db.Integer,
+        db.ForeignKey("cours_session.id", onupdate="CASCADE", ondelete="CASCADE"),
+        nullable=False
+    )
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime, nullable=False)
+    source = db.Column(db.String(255))
+    host = db.Column(db.String(100))
+
+    frames_captured = db.Column(db.Integer, nullable=False, default=0)
+    frames_analyzed = db.Column(db.Integer, nullable=False, default=0)
+    frames_dropped = db.Column(db.Integer, nullable=False, default=0)
+    capture_fps = db.Column(db.Float)
+    faces_seen = db.Column(db.Integer, nullable=False, default=0)
+    faces_per_frame = db.Column(db.Float)
+    faces_recognized = db.Column(db.Integer, nullable=False, default=0)
+    faces_unknown = db.Column(db.Integer, nullable=False, default=0)
+    students_recorded = db.Column(db.Integer, nullable=False, default=0)
+
+    capture_mean_ms = db.Column(db.Float)
+    capture_p95_ms = db.Column(db.Float)
+    detect_mean_ms = db.Column(db.Float)
+    detect_p95_ms = db.Column(db.Float)
+    embed_mean_ms = db.Column(db.Float)
+    embed_p95_ms = db.Column(db.Float)
+    match_mean_ms = db.Column(db.Float)
+    match_p95_ms = db.Column(db.Float)
+    persist_mean_ms = db.Column(db.Float)
+    persist_p95_ms = db.Column(db.Float)
+    render_mean_ms = db.Column(db.Float)
+    render_p95_ms = db.Column(db.Float)
+    end_to_end_mean_ms = db.Column(db.Float)
+    end_to_end_p95_ms = db.Column(db.Float)
+
+    session = relationship('CoursSessionModel', backref='scan_runs', lazy='joined')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cours_session_id': self.cours_session_id,
+            'cours': self.session.cours.nom if self.session and self.session.cours else None,
+            'filiere': self.session.cours.filiere if self.session and self.session.cours else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'source': self.source,
+            'host': self.host,
+            'frames_captured': self.frames_captured,
+            'frames_analyzed': self.frames_analyzed,
+            'frames_dropped': self.frames_dropped,
+            'capture_fps': self.capture_fps,
+            'faces_seen': self.faces_seen,
+            'faces_per_frame': self.faces_per_frame,
+            'faces_recognized': self.faces_recognized,
+            'faces_unknown': self.faces_unknown,
+            'students_recorded': self.students_recorded,
+            'latencies': {
+                stage: {
+                    'mean_ms': getattr(self, f"{stage}_mean_ms"),
+                    'p95_ms': getattr(self, f"{stage}_p95_ms")
+                } for stage in SCAN_RUN_STAGES
+            }
+        }
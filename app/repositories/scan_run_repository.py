@@ -0,0 +1,38 @@
+# app/repositories/scan_run_repository.py
+from app.database.connDB import db
+from app.models.course import CoursModel
+from app.models.course_session import CoursSessionModel
+from app.models.scan_run import ScanRunModel
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class ScanRunRepository:
+
+    @staticmethod
+    def create(**fields):
+        """Un seul INSERT par scan, à la fin du scan."""
+        try:
+            run = ScanRunModel(**fields)
+            db.session.add(run)
+            db.session.commit()
+            return run
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def get_runs(filiere=None, date_debut=None, date_fin=None, limit=500):
+        """Rapports de scan (les plus anciens d'abord), filtrés par filière et période."""
+        query = (
+            ScanRunModel.query
+            .join(CoursSessionModel, CoursSessionModel.id == ScanRunModel.cours_session_id)
+            .join(CoursModel, CoursModel.id == CoursSessionModel.cours_id)
+        )
+        if filiere:
+            query = query.filter(CoursModel.filiere == filiere)
+        if date_debut:
+            query = query.filter(ScanRunModel.started_at >= date_debut)
+        if date_fin:
+            query = query.filter(ScanRunModel.started_at <= date_fin)
+        runs = query.order_by(ScanRunModel.started_at.desc()).limit(limit).all()
+        return list(reversed(runs))
@@ -7,6 +7,15 @@ from app.database.connDB import db
 DATASET_FOLDER = "dataset"
 
 
+def _invalidate_gallery(reason):
+    """Incrémente la version de la galerie en cache (ce processus et service de reconnaissance)."""
+    try:
+        from app.services.scan_backend import invalidate_gallery
+        invalidate_gallery(reason)
+    except Exception as e:
+        print(f"[!] Erreur invalidation galerie: {e}")
+
+
 class EtudiantRepository:
 
     @staticmethod
@@ -141,6 +150,12 @@ class EtudiantRepository:
     def get_by_id(etudiant_id):
         return EtudiantModel.query.get(etudiant_id)
 
+    @staticmethod
+    def get_ids_by_filiere(filiere):
+        """IDs des étudiants d'une filière (liste des candidats d'un scan)."""
+        rows = db.session.query(EtudiantModel.id).filter_by(filiere=filiere).all()
+        return [row.id for row in rows]
+
     @staticmethod
     def update_etudiant(etudiant, data, files=None):
         try:
@@ -181,6 +196,9 @@ class EtudiantRepository:
                     pass
 
             db.session.commit()
+
+            # La filière a pu changer : les scans en cours rechargent la galerie
+            _invalidate_gallery(f"modification étudiant {etudiant.id}")
             return etudiant
         except Exception as e:
             db.session.rollback()
@@ -197,9 +215,18 @@ class EtudiantRepository:
                 print(f"[✓] Dossier supprimé: {etudiant_folder}")
 
             # Supprimer de la base de données
+            etudiant_id = etudiant.id
             db.session.delete(etudiant)
             db.session.commit()
-            print(f"[✓] Étudiant {etudiant.id} supprimé de la DB")
+            print(f"[✓] Étudiant {etudiant_id} supprimé de la DB")
+
+            # Retirer l'étudiant de la galerie compilée et des scans en cours
+            try:
+                from app.services import gallery_store
+                gallery_store.remove_embedding(etudiant_id)
+            except Exception as e:
+                print(f"[!] Erreur suppression dans la galerie compilée: {e}")
+            _invalidate_gallery(f"suppression étudiant {etudiant_id}")
 
         except Exception as e:
             db.session.rollback()
@@ -0,0 +1,371 @@
+# app/services/capture_sources.py
+"""
+Sources de capture du scan, toutes avec l'interface de cv2.VideoCapture
+utilisée par ScanPipeline (read(), release(), isOpened()) :
+
+    0, "1"                        caméra locale (index)
+    "rtsp://...", "http://..."    caméra IP / flux réseau (reconnexion auto)
+    "cours.mp4", "file:cours.mp4" vidéo enregistrée (rejouée à sa cadence)
+    "dossier/"                    dossier d'images (ordre alphabétique)
+    "synthetic", "synthetic:640x480@30"  frames générées (tests, sans caméra)
+
+Les vidéos et dossiers d'images se terminent (finished = True) à la fin du
+fichier : le scan s'arrête, ce qui permet de rejouer une séance à l'identique.
+"""
+import os
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+CAMERA_INDEXES = [0, 1, 2]  # caméras essayées quand aucune source n'est précisée
+STREAM_SCHEMES = ("rtsp", "rtsps", "rtmp", "http", "https")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+FOLDER_FPS = 5  # images par seconde pour un dossier d'images
+SYNTHETIC_SIZE = (640, 480)
+SYNTHETIC_FPS = 30
+RECONNECT_DELAY = 2.0  # secondes avant de rouvrir un flux réseau coupé
+
+# Source de capture décrite par /scan/start : kind = device, stream, file, folder, synthetic
+CaptureSpec = namedtuple("CaptureSpec", ["kind", "target", "options"])
+
+
+def parse_source(source):
+    """
+    Interprète la source demandée (None = première caméra locale libre).
+
+    Raises:
+        ValueError: source invalide ou introuvable
+    """
+    if source is None:
+        return None
+    if isinstance(source, bool) or not isinstance(source, (int, str)):
+        raise ValueError("source doit être un index de caméra ou une chaîne")
+
+    if isinstance(source, int) or source.strip().isdigit():
+        index = int(source)
+        if index < 0:
+            raise ValueError("L'index de caméra doit être positif")
+        return CaptureSpec("device", index, {})
+
+    source = source.strip()
+    if not source:
+        raise ValueError("source ne peut pas être vide")
+
+    if source.startswith("synthetic"):
+        return _parse_synthetic(source)
+
+    if urlparse(source).scheme.lower() in STREAM_SCHEMES:
+        return CaptureSpec("stream", source, {})
+
+    path = source[len("file:"):] if source.startswith("file:") else source
+    if os.path.isdir(path):
+        return CaptureSpec("folder", path, {})
+    if os.path.isfile(path):
+        return CaptureSpec("file", path, {})
+    raise ValueError(f"Source de capture introuvable: {source}")
+
+
+def restrict_source(source, root=None, allowed_streams=()):
+    """
+    Vérifie une source reçue d'un client (/scan/start) avant parse_source.
+
+    Caméras locales et "synthetic" sont toujours acceptées ; une vidéo ou un
+    dossier d'images doit se trouver sous root (chemin relatif = relatif à
+    root), un flux réseau doit figurer dans allowed_streams (URL exacte ou
+    préfixe suivi de "/").
+
+    Returns:
+        la source à passer à parse_source (chemin résolu pour un fichier)
+
+    Raises:
+        ValueError: source refusée
+    """
+    if source is None or isinstance(source, bool) or not isinstance(source, (int, str)):
+        return source
+    if isinstance(source, int) or source.strip().isdigit() or source.strip().startswith("synthetic"):
+        return source
+
+    source = source.strip()
+    if urlparse(source).scheme.lower() in STREAM_SCHEMES:
+        for allowed in allowed_streams or ():
+            allowed = allowed.rstrip("/")
+            if source == allowed or source.startswith(allowed + "/"):
+                return source
+        raise ValueError("Flux non autorisé (voir SCAN_ALLOWED_STREAMS)")
+
+    if not root:
+        raise ValueError("Les vidéos et dossiers d'images ne sont pas autorisés (voir SCAN_SOURCE_ROOT)")
+    path = source[len("file:"):] if source.startswith("file:") else source
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError("Source hors du dossier autorisé (SCAN_SOURCE_ROOT)")
+    return path
+
+
+def _parse_synthetic(source):
+    """synthetic[:LARGEURxHAUTEUR][@FPS]"""
+    width, height = SYNTHETIC_SIZE
+    fps = SYNTHETIC_FPS
+    _, _, params = source.partition(":")
+    try:
+        if "@" in params:
+            params, fps = params.split("@", 1)
+            fps = float(fps)
+        if params:
+            width, height = (int(v) for v in params.lower().split("x", 1))
+    except ValueError:
+        raise ValueError(f"Source synthétique invalide: {source} (ex. synthetic:640x480@30)")
+    if width <= 0 or height <= 0 or fps <= 0:
+        raise ValueError(f"Source synthétique invalide: {source}")
+    return CaptureSpec("synthetic", None, {"width": width, "height": height, "fps": fps})
+
+
+def redact_url(url):
+    """URL sans identifiants (user:pass@) : seule forme affichée ou enregistrée."""
+    parsed = urlparse(url)
+    return parsed._replace(netloc=parsed.netloc.rpartition("@")[2]).geturl()
+
+
+def describe(spec):
+    """Texte de la source pour /scan/status (identifiants des flux masqués)."""
+    if spec is None:
+        return None
+    if spec.kind == "synthetic":
+        return f"synthetic:{spec.options['width']}x{spec.options['height']}@{spec.options['fps']:g}"
+    if spec.kind == "stream":
+        return redact_url(spec.target)
+    return spec.target
+
+
+def open_capture_source(spec, exclude=()):
+    """
+    Ouvre la source décrite par spec (None = première caméra locale qui
+    répond, hors index de exclude).
+
+    Returns:
+        source ouverte, ou None
+    """
+    if spec is None:
+        for index in CAMERA_INDEXES:
+            if index in exclude:
+                continue
+            source = DeviceSource(index)
+            if source.isOpened():
+                return source
+        print("Aucune webcam accessible")
+        return None
+
+    factories = {
+        "device": lambda: DeviceSource(spec.target),
+        "stream": lambda: StreamSource(spec.target),
+        "file": lambda: VideoFileSource(spec.target, **spec.options),
+        "folder": lambda: ImageFolderSource(spec.target, **spec.options),
+        "synthetic": lambda: SyntheticSource(**spec.options),
+    }
+    source = factories[spec.kind]()
+    if not source.isOpened():
+        print(f"[ERROR] Impossible d'ouvrir la source {describe(spec)}")
+        source.release()
+        return None
+    print(f"[INFO] Source de capture : {source.description}")
+    return source
+
+
+class _Pacer:
+    """Limite la lecture à fps images par seconde (rejeu en temps réel)."""
+
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps and fps > 0 else 0.0
+        self._next = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next is not None and self._next > now:
+            time.sleep(self._next - now)
+            now = self._next
+        self._next = now + self.interval
+
+
+class CaptureSource:
+    """Interface commune (celle de cv2.VideoCapture utilisée par le scan)."""
+
+    description = "source"
+    finished = False  # True quand une vidéo / un dossier est terminé
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class _OpenCVSource(CaptureSource):
+    def __init__(self):
+        self._cap = None
+
+    def isOpened(self):
+        return self._cap is not None and self._cap.isOpened()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+class DeviceSource(_OpenCVSource):
+    """Caméra locale (index OpenCV)."""
+
+    def __init__(self, index):
+        import cv2
+        super().__init__()
+        self.index = index
+        self.description = f"caméra {index}"
+        try:
+            # CAP_DSHOW sur Windows pour de meilleures performances
+            cap = cv2.VideoCapture(index, cv2.CAP_DSHOW) if os.name == 'nt' else cv2.VideoCapture(index)
+            if cap.isOpened() and cap.read()[0]:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                cap.set(cv2.CAP_PROP_FPS, 30)
+                self._cap = cap
+                print(f"[INFO] Webcam trouvée à l'index {index}")
+            else:
+                cap.release()
+        except Exception as e:
+            print(f"[WARNING] Erreur avec la webcam index {index}: {e}")
+
+    def read(self):
+        return self._cap.read()
+
+
+class StreamSource(_OpenCVSource):
+    """Caméra IP / flux réseau (RTSP, HTTP MJPEG), rouvert si la connexion tombe."""
+
+    def __init__(self, url, reconnect_delay=RECONNECT_DELAY):
+        super().__init__()
+        self.url = url
+        self.reconnect_delay = reconnect_delay
+        self.description = f"flux {redact_url(url)}"
+        self._open()
+
+    def _open(self):
+        import cv2
+        cap = cv2.VideoCapture(self.url, cv2.CAP_FFMPEG)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # frame la plus récente, pas de retard accumulé
+        self._cap = cap if cap.isOpened() else None
+        if self._cap is None:
+            cap.release()
+
+    def read(self):
+        if self._cap is not None:
+            ret, frame = self._cap.read()
+            if ret:
+                return ret, frame
+
+        print(f"[WARNING] Flux interrompu, reconnexion dans {self.reconnect_delay}s...")
+        self.release()
+        time.sleep(self.reconnect_delay)
+        self._open()
+        return False, None
+
+
+class VideoFileSource(_OpenCVSource):
+    """Vidéo enregistrée, rejouée à sa cadence (realtime) ou au plus vite."""
+
+    def __init__(self, path, loop=False, realtime=True):
+        import cv2
+        super().__init__()
+        self.path = path
+        self.loop = loop
+        self.description = f"vidéo {os.path.basename(path)}"
+        cap = cv2.VideoCapture(path)
+        self._cap = cap if cap.isOpened() else None
+        fps = cap.get(cv2.CAP_PROP_FPS) if self._cap is not None else 0
+        self._pacer = _Pacer((fps or 25) if realtime else 0)
+
+    def read(self):
+        import cv2
+        if self._cap is None:
+            return False, None
+        self._pacer.wait()
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        if not ret:
+            self.finished = True
+        return ret, frame
+
+
+class ImageFolderSource(CaptureSource):
+    """Dossier d'images lues dans l'ordre alphabétique."""
+
+    def __init__(self, path, fps=FOLDER_FPS, loop=False):
+        self.path = path
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.description = f"dossier {os.path.basename(os.path.normpath(path))} ({len(self.files)} images)"
+        self._position = 0
+        self._pacer = _Pacer(fps)
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def read(self):
+        import cv2
+        if self._position >= len(self.files):
+            if not self.loop or not self.files:
+                self.finished = True
+                return False, None
+            self._position = 0
+
+        self._pacer.wait()
+        frame = cv2.imread(self.files[self._position])
+        self._position += 1
+        return frame is not None, frame
+
+
+class SyntheticSource(CaptureSource):
+    """
+    Frames générées (fond en dégradé + carré qui se déplace), identiques d'une
+    exécution à l'autre : tests et mesures de débit sans caméra.
+    """
+
+    def __init__(self, width=SYNTHETIC_SIZE[0], height=SYNTHETIC_SIZE[1], fps=SYNTHETIC_FPS,
+                 max_frames=None):
+        self.width = width
+        self.height = height
+        self.max_frames = max_frames
+        self.description = f"synthétique {width}x{height}@{fps:g}"
+        self._pacer = _Pacer(fps)
+        self._index = 0
+        gradient = np.linspace(40, 200, width, dtype=np.uint8)
+        self._background = np.repeat(np.tile(gradient, (height, 1))[:, :, np.newaxis], 3, axis=2)
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        if self.max_frames is not None and self._index >= self.max_frames:
+            self.finished = True
+            return False, None
+
+        self._pacer.wait()
+        frame = self._background.copy()
+        size = max(8, min(self.width, self.height) // 4)
+        x = (self._index * 4) % max(1, self.width - size)
+        y = (self.height - size) // 2
+        frame[y:y + size, x:x + size] = 255
+        self._index += 1
+        return True, frame
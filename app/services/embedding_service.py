@@ -2,20 +2,27 @@
 import os
 import json
 import numpy as np
-from deepface import DeepFace
 import threading
 from datetime import datetime
 import logging
 
+from flask import current_app, has_app_context
+
+from app.services import gallery_store
+
 logger = logging.getLogger(__name__)
 
 
 class EmbeddingService:
 
     @staticmethod
-    def generate_embeddings_for_student(student_id):
+    def generate_embeddings_for_student(student_id, config=None):
         """
         Génère automatiquement les embeddings pour un étudiant
+
+        Args:
+            config: configuration de l'application (service de reconnaissance
+                à prévenir) ; None = contexte courant ou Config
         """
         try:
             print(f"[EMBEDDING] Début génération pour étudiant {student_id}")
@@ -42,6 +49,9 @@ class EmbeddingService:
 
             print(f"[✓] Tous les fichiers présents pour étudiant {student_id}")
 
+            # DeepFace (TensorFlow) importé seulement à la première génération
+            from deepface import DeepFace
+
             # Générer les embeddings pour chaque photo
             embeddings = []
 
@@ -91,6 +101,20 @@ class EmbeddingService:
             print(f"[✓] Embedding sauvegardé: {output_file}")
             print(f"[✓] Taille embedding: {len(mean_embedding)} dimensions")
 
+            # Mise à jour incrémentale de la galerie compilée (pas de recompilation complète)
+            try:
+                gallery_store.upsert_embedding(student_id, mean_embedding)
+                print(f"[✓] Galerie compilée mise à jour pour étudiant {student_id}")
+            except Exception as e:
+                # Galerie recompilée depuis le dataset au prochain chargement
+                print(f"[!] Erreur mise à jour galerie compilée: {e}")
+                gallery_store.discard_compiled_gallery()
+
+            # Les scans en cours reconnaissent l'étudiant dès la frame suivante
+            # (y compris dans le service de reconnaissance séparé)
+            from app.services.scan_backend import invalidate_gallery
+            invalidate_gallery(f"embeddings étudiant {student_id}", config)
+
             return True
 
         except Exception as e:
@@ -105,9 +129,12 @@ class EmbeddingService:
         Lance en arrière-plan
         """
 
+        # Le thread n'a pas de contexte d'application
+        config = current_app.config if has_app_context() else None
+
         def generate_in_thread():
             try:
-                EmbeddingService.generate_embeddings_for_student(student_id)
+                EmbeddingService.generate_embeddings_for_student(student_id, config)
             except Exception as e:
                 logger.error(f"Erreur thread embeddings: {e}")
 
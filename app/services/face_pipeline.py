@@ -0,0 +1,168 @@
+# app/services/face_pipeline.py
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+MODEL_NAME = "ArcFace"
+DETECTOR_BACKEND = "yolov8"
+MAX_BATCH_SIZE = 32  # nombre max de visages par passe du modèle
+WARMUP_FRAME_SIZE = 320  # taille de l'image factice du préchauffage
+
+# Visage détecté dans une frame :
+#   x, y, w, h : boîte dans la frame (coordonnées valides)
+#   face       : visage aligné renvoyé par le détecteur (RGB, float [0, 1])
+#   landmarks  : points des yeux relatifs à la boîte [(x, y), ...] (peut être vide)
+DetectedFace = namedtuple("DetectedFace", ["x", "y", "w", "h", "face", "landmarks"])
+
+
+class FacePipeline:
+    """
+    Détection et embedding en une seule passe.
+
+    Le détecteur (yolov8) tourne une seule fois par frame ; les visages alignés
+    et les points des yeux de cette passe sont directement envoyés au modèle
+    d'embedding, sans nouvelle détection sur chaque visage.
+
+    DeepFace (et TensorFlow) n'est importé qu'à la première utilisation.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, detector_backend=DETECTOR_BACKEND):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self._model = None
+        self._warmup_lock = threading.Lock()
+        self.ready = False  # modèles construits et préchauffés
+        self.warmup_ms = None
+
+    @property
+    def model(self):
+        """Modèle d'embedding, construit une seule fois."""
+        if self._model is None:
+            from deepface import DeepFace
+            self._model = DeepFace.build_model(self.model_name)
+        return self._model
+
+    def warmup(self):
+        """
+        Construit le détecteur et le modèle d'embedding puis fait une inférence
+        factice (initialisation TensorFlow, chargement des poids, graphe compilé).
+        Sans effet si déjà fait ; un appel concurrent attend la fin du premier.
+
+        Returns:
+            durée du préchauffage en ms
+        """
+        with self._warmup_lock:
+            if self.ready:
+                return self.warmup_ms
+
+            print(f"[INFO] Préchauffage des modèles ({self.detector_backend} + {self.model_name})...")
+            start = time.perf_counter()
+            frame = np.zeros((WARMUP_FRAME_SIZE, WARMUP_FRAME_SIZE, 3), dtype=np.uint8)
+            self.detect(frame)
+            target_h, target_w = self.model.input_shape[:2]
+            self.embed_batch([np.zeros((target_h, target_w, 3), dtype=np.float32)])
+
+            self.warmup_ms = round((time.perf_counter() - start) * 1000.0, 1)
+            self.ready = True
+            print(f"[INFO] Modèles prêts en {self.warmup_ms} ms")
+            return self.warmup_ms
+
+    def detect(self, frame):
+        """
+        Détecte et aligne les visages d'une frame (une seule passe du détecteur).
+
+        Returns:
+            list[DetectedFace]
+        """
+        from deepface import DeepFace
+        results = DeepFace.extract_faces(
+            frame,
+            detector_backend=self.detector_backend,
+            enforce_detection=False,
+            align=True
+        )
+
+        h_img, w_img = frame.shape[:2]
+        faces = []
+
+        for result in results:
+            area = result["facial_area"]
+            x, y, w, h = area["x"], area["y"], area["w"], area["h"]
+
+            # Vérifier que la zone du visage est valide et dans l'image
+            if w <= 0 or h <= 0 or x < 0 or y < 0:
+                continue
+            if min(w_img, x + w) <= x or min(h_img, y + h) <= y:
+                continue
+
+            face = result.get("face")
+            if face is None or face.size == 0:
+                continue
+
+            landmarks = []
+            for eye in ("left_eye", "right_eye"):
+                point = area.get(eye)
+                if point is not None:
+                    landmarks.append((int(point[0]) - x, int(point[1]) - y))
+
+            faces.append(DetectedFace(x, y, w, h, face, landmarks))
+
+        return faces
+
+    def preprocess(self, face):
+        """Prépare un visage aligné pour le modèle (mêmes étapes que DeepFace.represent)."""
+        from deepface.modules import preprocessing
+        target_size = self.model.input_shape
+        img = face[:, :, ::-1]  # RGB -> BGR, comme DeepFace.represent
+        img = preprocessing.resize_image(img=img, target_size=(target_size[1], target_size[0]))
+        return preprocessing.normalize_input(img=img, normalization="base")
+
+    def embed(self, face):
+        """Embedding d'un visage déjà détecté et aligné (aucune détection)."""
+        return self.embed_batch([face])[0]
+
+    def embed_batch(self, faces):
+        """
+        Embeddings de plusieurs visages alignés en une seule passe du modèle.
+
+        Les visages peuvent venir d'une ou plusieurs frames ; les vecteurs sont
+        retournés dans le même ordre.
+
+        Returns:
+            np.ndarray shape (n_visages, dim)
+        """
+        if not faces:
+            return np.empty((0, 0), dtype=np.float32)
+
+        outputs = []
+        for start in range(0, len(faces), MAX_BATCH_SIZE):
+            chunk = faces[start:start + MAX_BATCH_SIZE]
+            batch = np.concatenate([self.preprocess(face) for face in chunk], axis=0)
+            outputs.append(self._forward_batch(batch))
+        return np.concatenate(outputs, axis=0)
+
+    def _forward_batch(self, batch):
+        """Passe avant sur un batch (n, h, w, 3) préparé par preprocess()."""
+        keras_model = getattr(self.model, "model", None)
+        if keras_model is None:
+            # Client sans modèle Keras exposé : un appel par visage
+            return np.stack([
+                np.asarray(self.model.forward(img[np.newaxis]), dtype=np.float32)
+                for img in batch
+            ])
+        return np.asarray(keras_model(batch, training=False), dtype=np.float32)
+
+    def process(self, frame):
+        """
+        Détecte les visages puis calcule tous leurs embeddings en un seul batch.
+
+        Returns:
+            list de (DetectedFace, embedding)
+        """
+        faces = self.detect(frame)
+        if not faces:
+            return []
+        embeddings = self.embed_batch([face.face for face in faces])
+        return list(zip(faces, embeddings))
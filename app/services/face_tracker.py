@@ -0,0 +1,109 @@
+# app/services/face_tracker.py
+import itertools
+
+import numpy as np
+
+IOU_THRESHOLD = 0.3  # recouvrement minimal pour associer une détection à une piste
+MAX_MISSES = 3  # nombre de keyframes sans détection avant suppression de la piste
+CONFIRM_HITS = 2  # reconnaissances concordantes pour confirmer l'identité d'une piste
+
+
+def iou(box_a, box_b):
+    """Intersection sur union de deux boîtes (x, y, w, h)."""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class Track:
+    """Visage suivi entre les keyframes, avec son identité en cache."""
+
+    def __init__(self, track_id, box, landmarks):
+        self.track_id = track_id
+        self.box = box
+        self.landmarks = landmarks
+        self.student_id = None
+        self.distance = float("inf")
+        self.hits = 0  # reconnaissances concordantes consécutives
+        self.misses = 0
+
+    @property
+    def confirmed(self):
+        return self.student_id is not None and self.hits >= CONFIRM_HITS
+
+    def update_identity(self, student_id, distance):
+        """Met à jour l'identité après un embedding de cette piste."""
+        if student_id is not None and student_id == self.student_id:
+            self.hits += 1
+        else:
+            self.hits = 1 if student_id is not None else 0
+        self.student_id = student_id
+        self.distance = distance
+
+
+class FaceTracker:
+    """
+    Suivi des visages par association IoU entre keyframes.
+
+    Les pistes gardent un identifiant stable et l'identité reconnue ; seules
+    les pistes nouvelles ou non confirmées ont besoin d'un nouvel embedding.
+    """
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, max_misses=MAX_MISSES):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections):
+        """
+        Associe les détections d'une keyframe aux pistes existantes.
+
+        Args:
+            detections: liste d'objets avec x, y, w, h, landmarks
+
+        Returns:
+            liste de Track, une par détection (même ordre)
+        """
+        boxes = [(d.x, d.y, d.w, d.h) for d in detections]
+        assigned = [None] * len(detections)
+
+        if self.tracks and boxes:
+            scores = np.array([[iou(t.box, b) for b in boxes] for t in self.tracks])
+            # Association gloutonne par IoU décroissant
+            for flat in np.argsort(scores, axis=None)[::-1]:
+                t_idx, d_idx = np.unravel_index(flat, scores.shape)
+                if scores[t_idx, d_idx] < self.iou_threshold:
+                    break
+                track = self.tracks[t_idx]
+                if assigned[d_idx] is not None or any(a is track for a in assigned):
+                    continue
+                assigned[d_idx] = track
+
+        matched = set()
+        for d_idx, detection in enumerate(detections):
+            track = assigned[d_idx]
+            if track is None:
+                track = Track(next(self._ids), boxes[d_idx], detection.landmarks)
+                self.tracks.append(track)
+                assigned[d_idx] = track
+            else:
+                track.box = boxes[d_idx]
+                track.landmarks = detection.landmarks
+                track.misses = 0
+            matched.add(track.track_id)
+
+        for track in self.tracks:
+            if track.track_id not in matched:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        return assigned
+
+    def reset(self):
+        self.tracks = []
@@ -0,0 +1,93 @@
+# app/services/frame_scheduler.py
+import threading
+import time
+from collections import deque
+
+
+class AdaptiveFrameScheduler:
+    """
+    Choisit combien de frames sauter entre deux reconnaissances (frame skip).
+
+    Mesure, sur une fenêtre glissante, la latence détection + embedding, le
+    débit de la caméra et le FPS d'affichage, puis ajuste frame_skip pour :
+      - viser target_recognition_fps reconnaissances par seconde,
+      - sans dépasser ce que la machine peut calculer (latence mesurée),
+      - en ralentissant la reconnaissance si l'affichage passe sous target_display_fps.
+    """
+
+    def __init__(self, target_display_fps=15.0, target_recognition_fps=3.0,
+                 initial_skip=5, min_skip=1, max_skip=60, window=30):
+        self.target_display_fps = target_display_fps
+        self.target_recognition_fps = target_recognition_fps
+        self.min_skip = min_skip
+        self.max_skip = max_skip
+
+        self._lock = threading.Lock()
+        self._capture_times = deque(maxlen=window)
+        self._display_times = deque(maxlen=window)
+        self._recognition_times = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._backoff = 1.0
+        self._frame_skip = initial_skip
+
+    @property
+    def frame_skip(self):
+        return self._frame_skip
+
+    def should_analyze(self, frame_id):
+        """True si cette frame doit être envoyée à la reconnaissance."""
+        return frame_id % self._frame_skip == 0
+
+    def record_capture(self, now=None):
+        self._capture_times.append(now if now is not None else time.perf_counter())
+
+    def record_display(self, now=None):
+        self._display_times.append(now if now is not None else time.perf_counter())
+
+    def record_recognition(self, latency, now=None):
+        """Enregistre la latence (s) d'une détection + embedding et réajuste frame_skip."""
+        with self._lock:
+            self._recognition_times.append(now if now is not None else time.perf_counter())
+            self._latencies.append(latency)
+            self._update()
+
+    @staticmethod
+    def _rate(times):
+        """Fréquence (par seconde) des évènements de la fenêtre."""
+        if len(times) < 2:
+            return 0.0
+        elapsed = times[-1] - times[0]
+        return (len(times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def _update(self):
+        capture_fps = self._rate(self._capture_times)
+        if capture_fps <= 0:
+            return
+
+        mean_latency = sum(self._latencies) / len(self._latencies)
+
+        # Intervalle visé entre deux reconnaissances, borné par la latence mesurée
+        interval = max(1.0 / self.target_recognition_fps, mean_latency)
+
+        # L'affichage décroche : on laisse plus de CPU au rendu
+        display_fps = self._rate(self._display_times)
+        if display_fps and display_fps < self.target_display_fps:
+            self._backoff = min(self._backoff * 1.25, 8.0)
+        else:
+            self._backoff = max(self._backoff * 0.9, 1.0)
+
+        skip = round(capture_fps * interval * self._backoff)
+        self._frame_skip = int(min(self.max_skip, max(self.min_skip, skip)))
+
+    def snapshot(self):
+        """Débits effectifs courants (pour /scan/status)."""
+        latencies = list(self._latencies)
+        return {
+            "frame_skip": self._frame_skip,
+            "capture_fps": round(self._rate(self._capture_times), 2),
+            "display_fps": round(self._rate(self._display_times), 2),
+            "recognition_fps": round(self._rate(self._recognition_times), 2),
+            "recognition_latency_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else None,
+            "target_display_fps": self.target_display_fps,
+            "target_recognition_fps": self.target_recognition_fps
+        }
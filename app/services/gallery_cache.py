@@ -0,0 +1,107 @@
+# app/services/gallery_cache.py
+import threading
+
+from app.services import gallery_store
+
+
+class GalleryCache:
+    """
+    Cache de la galerie partagé par tout le processus.
+
+    Chaque inscription, modification ou suppression d'étudiant incrémente la
+    version (invalidate). La galerie n'est rechargée depuis le disque qu'au
+    prochain get() après un changement de version ; un scan en cours compare
+    sa version à celle du cache entre deux frames et remplace sa galerie
+    sans redémarrer la caméra.
+
+    Chaque version est un instantané immuable (génération du fichier de
+    gallery_store, jamais modifiée en place) : l'ancien reste utilisable
+    jusqu'à ce que le nouveau soit chargé. Le chargement et la requête des
+    étudiants d'une filière se font hors du verrou ; pendant un rechargement,
+    les autres scans continuent avec l'instantané précédent.
+
+    Les embeddings écrits hors de l'application (scripts face_engine) sont
+    détectés au démarrage de chaque scan (revalidate).
+    """
+
+    def __init__(self, loader=None, stale_check=None):
+        self._loader = loader or gallery_store.load_or_compile_gallery
+        # Sans loader personnalisé : comparaison de l'en-tête avec le dataset
+        self._stale_check = stale_check or (None if loader else gallery_store.is_stale)
+        self._lock = threading.Lock()  # état du cache (jamais tenu pendant un chargement)
+        self._load_lock = threading.Lock()  # un seul rechargement à la fois
+        self._version = 0
+        self._loaded_version = None
+        self._matcher = None
+        self._candidates = {}  # clé (ex. filière) -> (version, sous-galerie)
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self, reason=None):
+        """Marque la galerie comme obsolète (nouvelle version)."""
+        with self._lock:
+            self._version += 1
+            version = self._version
+        print(f"[INFO] Galerie invalidée (version {version}){f' : {reason}' if reason else ''}")
+        return version
+
+    def revalidate(self):
+        """Invalide la galerie si le dataset a changé depuis sa compilation."""
+        if self._stale_check is not None and self._matcher is not None and self._stale_check():
+            return self.invalidate("dataset modifié")
+        return self._version
+
+    def get(self):
+        """
+        Retourne (version, GalleryMatcher), rechargé seulement si la version a changé.
+        Si un autre thread recharge déjà, retourne l'instantané précédent.
+        """
+        with self._lock:
+            if self._matcher is not None and self._loaded_version == self._version:
+                return self._loaded_version, self._matcher
+            has_snapshot = self._matcher is not None
+
+        if not self._load_lock.acquire(blocking=not has_snapshot):
+            with self._lock:
+                return self._loaded_version, self._matcher
+        try:
+            with self._lock:
+                version = self._version
+                if self._matcher is not None and self._loaded_version == version:
+                    return version, self._matcher
+            matcher = self._loader()
+            with self._lock:
+                self._matcher = matcher
+                self._loaded_version = version
+                self._candidates = {}
+            return version, matcher
+        finally:
+            self._load_lock.release()
+
+    def get_candidates(self, key, ids_loader):
+        """
+        Sous-galerie des étudiants retournés par ids_loader (ex. la filière d'un cours).
+
+        Le résultat est mis en cache par clé jusqu'au prochain changement de
+        version : la liste des étudiants n'est relue qu'après une inscription,
+        une modification ou une suppression.
+
+        Returns:
+            (version, GalleryMatcher)
+        """
+        version, matcher = self.get()
+        with self._lock:
+            cached = self._candidates.get(key)
+            if cached is not None and cached[0] == version:
+                return cached
+
+        candidates = (version, matcher.subset(ids_loader()))
+        with self._lock:
+            if self._loaded_version == version:
+                self._candidates[key] = candidates
+        return candidates
+
+
+gallery_cache = GalleryCache()
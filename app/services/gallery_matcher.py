@@ -0,0 +1,135 @@
+# app/services/gallery_matcher.py
+import numpy as np
+
+
+class GalleryMatcher:
+    """
+    Galerie d'embeddings pour la reconnaissance faciale.
+
+    Tous les embeddings des étudiants sont stockés dans une seule matrice
+    float32 contiguë, normalisée une fois pour toutes (norme L2 = 1).
+    La distance cosinus entre tous les visages d'une frame et tous les
+    étudiants se calcule alors avec un seul produit matriciel.
+    """
+
+    def __init__(self, ids, matrix, normalized=False):
+        """
+        Args:
+            ids: identifiants des étudiants (même ordre que les lignes de matrix)
+            matrix: embeddings, shape (n_etudiants, dim)
+            normalized: True si les lignes sont déjà normalisées (pas de copie)
+        """
+        self.ids = np.asarray(ids, dtype=np.int64)
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+        if len(self.ids) != matrix.shape[0]:
+            raise ValueError(
+                f"Nombre d'ids ({len(self.ids)}) différent du nombre d'embeddings ({matrix.shape[0]})"
+            )
+
+        self.matrix = matrix if normalized else self.normalize(matrix)
+        self.matrix = np.ascontiguousarray(self.matrix)
+
+    @classmethod
+    def from_embeddings(cls, embeddings_db):
+        """Construit la galerie depuis un dict {student_id: embedding}."""
+        if not embeddings_db:
+            return cls.empty()
+
+        ids = list(embeddings_db.keys())
+        matrix = np.stack([np.asarray(embeddings_db[i], dtype=np.float32) for i in ids])
+        return cls(ids, matrix)
+
+    @classmethod
+    def empty(cls, dim=512):
+        """Galerie vide (aucun étudiant)."""
+        return cls([], np.zeros((0, dim), dtype=np.float32), normalized=True)
+
+    @staticmethod
+    def normalize(vectors):
+        """Normalise chaque ligne (norme L2) en float32 contigu."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+    def mask(self, ids):
+        """Masque booléen des lignes dont l'id appartient à ids."""
+        return np.isin(self.ids, np.asarray(list(ids), dtype=np.int64))
+
+    def subset(self, ids):
+        """
+        Sous-galerie limitée à certains étudiants (ex. la filière d'un cours).
+        Les ids absents de la galerie sont ignorés.
+        """
+        mask = self.mask(ids)
+        return GalleryMatcher(self.ids[mask], self.matrix[mask], normalized=True)
+
+    def exclude(self, ids):
+        """Sous-galerie sans certains étudiants (ex. ceux déjà enregistrés)."""
+        mask = ~self.mask(ids)
+        return GalleryMatcher(self.ids[mask], self.matrix[mask], normalized=True)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def distances(self, embeddings):
+        """
+        Distances cosinus entre les visages et tous les étudiants.
+
+        Returns:
+            np.ndarray shape (n_visages, n_etudiants)
+        """
+        queries = self.normalize(embeddings)
+        return 1.0 - queries @ self.matrix.T
+
+    def top_k(self, embeddings, k=1):
+        """
+        Les k étudiants les plus proches pour chaque visage (résultat exact).
+
+        Returns:
+            (ids, distances): deux tableaux shape (n_visages, k'), triés par
+            distance croissante, avec k' = min(k, taille de la galerie)
+        """
+        queries = np.atleast_2d(embeddings)
+        n_faces = queries.shape[0]
+        k = min(k, len(self))
+
+        if k <= 0 or n_faces == 0:
+            return (np.empty((n_faces, 0), dtype=np.int64),
+                    np.empty((n_faces, 0), dtype=np.float32))
+
+        dist = self.distances(queries)
+
+        if k < dist.shape[1]:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(dist.shape[1]), (n_faces, dist.shape[1]))
+
+        part = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+
+        return self.ids[idx], np.take_along_axis(part, order, axis=1)
+
+    def match(self, embeddings, threshold):
+        """
+        Meilleur étudiant pour chaque visage.
+
+        Returns:
+            liste de (student_id ou None, distance) dans l'ordre des visages.
+            student_id vaut None si la distance minimale >= threshold.
+        """
+        ids, dists = self.top_k(embeddings, k=1)
+        results = []
+        for row_ids, row_dists in zip(ids, dists):
+            if len(row_ids) == 0:
+                results.append((None, float("inf")))
+                continue
+            dist = float(row_dists[0])
+            student_id = int(row_ids[0]) if dist < threshold else None
+            results.append((student_id, dist))
+        return results
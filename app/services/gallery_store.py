@@ -0,0 +1,426 @@
+# app/services/gallery_store.py
+"""
+Galerie compilée : tous les embeddings des étudiants dans un seul fichier binaire.
+
+Structure (dans le dossier dataset) :
+    - gallery.json         : en-tête (modèle, dimension, nombre, ids, fichier vecteurs)
+    - gallery-<gen>.npy    : matrice float32 (capacité, dim) normalisée, lue en mmap
+
+Le fichier .npy est préalloué avec une capacité supérieure au nombre d'étudiants :
+l'ajout d'un étudiant écrit une ligne après les lignes existantes et met à jour
+l'en-tête, sans tout recompiler. Une galerie déjà chargée ne lit que ses
+`count` premières lignes : elle ne voit jamais ce changement.
+
+Le remplacement ou la suppression d'une ligne, et le dépassement de la
+capacité, écrivent une nouvelle génération du fichier (copie) puis remplacent
+l'en-tête : une galerie chargée n'est jamais modifiée sous un scan en cours.
+Les écritures sont protégées par un verrou de fichier (gallery.lock), partagé
+par les workers web et le service de reconnaissance.
+
+L'en-tête garde la date de modification de chaque embeddings.json compilé
+("sources") : un fichier ajouté, modifié ou supprimé hors de ce module (script
+face_engine, mise à jour incrémentale échouée) rend la galerie obsolète, et
+elle est recompilée au chargement suivant.
+
+Compilation manuelle :
+    python -m app.services.gallery_store
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.services.gallery_matcher import GalleryMatcher
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(BASE_DIR, "../../dataset")
+
+MODEL_NAME = "ArcFace"
+HEADER_FILE = "gallery.json"
+LOCK_FILE = "gallery.lock"
+FORMAT_VERSION = 1
+MIN_CAPACITY = 64
+WRITE_CHUNK = 10000  # lignes normalisées à la fois lors de la compilation
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _gallery_lock(dataset_path):
+    """Verrou exclusif sur la galerie : threads de ce processus puis autres processus."""
+    with _write_lock:
+        os.makedirs(dataset_path, exist_ok=True)
+        with open(os.path.join(dataset_path, LOCK_FILE), "a+b") as lock_file:
+            if os.name == "nt":
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _header_path(dataset_path):
+    return os.path.join(dataset_path, HEADER_FILE)
+
+
+def _read_header(dataset_path):
+    path = _header_path(dataset_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] En-tête de galerie illisible ({path}): {e}")
+        return None
+    if header.get("format") != FORMAT_VERSION:
+        return None
+    return header
+
+
+def _write_header(dataset_path, header):
+    """Écriture atomique de l'en-tête (fichier temporaire puis remplacement)."""
+    path = _header_path(dataset_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(tmp_path, path)
+
+
+def _new_vectors_file(dataset_path, header, capacity, dim):
+    """Crée une nouvelle génération du fichier de vecteurs et la retourne (mmap r+)."""
+    generation = (header or {}).get("generation", 0) + 1
+    filename = f"gallery-{generation}.npy"
+    vectors = np.lib.format.open_memmap(
+        os.path.join(dataset_path, filename),
+        mode="w+",
+        dtype=np.float32,
+        shape=(capacity, dim)
+    )
+    return generation, filename, vectors
+
+
+def _remove_old_vectors_file(dataset_path, filename):
+    """Supprime une ancienne génération (peut échouer si encore mappée, sous Windows)."""
+    if not filename:
+        return
+    try:
+        os.remove(os.path.join(dataset_path, filename))
+    except OSError:
+        pass
+
+
+def _embedding_file(dataset_path, student_id):
+    return os.path.join(dataset_path, f"etudiant_{student_id}", "embeddings.json")
+
+
+def _source_stamp(path):
+    """Date de modification (ns) d'un embeddings.json, None s'il n'existe pas."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def dataset_stamps(dataset_path=DATASET_PATH):
+    """{id étudiant (str): date de modification de son embeddings.json}, sans lire les fichiers."""
+    stamps = {}
+    if not os.path.isdir(dataset_path):
+        return stamps
+    with os.scandir(dataset_path) as entries:
+        for entry in entries:
+            if not entry.name.startswith("etudiant_") or not entry.is_dir():
+                continue
+            stamp = _source_stamp(os.path.join(entry.path, "embeddings.json"))
+            if stamp is not None:
+                stamps[entry.name.split("_", 1)[1]] = stamp
+    return stamps
+
+
+def is_stale(dataset_path=DATASET_PATH, model_name=MODEL_NAME):
+    """
+    True si la galerie compilée est absente, d'un autre modèle, ou ne
+    correspond plus aux embeddings.json du dataset (un stat par étudiant).
+    """
+    header = _read_header(dataset_path)
+    if header is None or header.get("model") != model_name:
+        return True
+    return header.get("sources") != dataset_stamps(dataset_path)
+
+
+def discard_compiled_gallery(dataset_path=DATASET_PATH):
+    """Supprime l'en-tête : la galerie sera recompilée au prochain chargement."""
+    with _gallery_lock(dataset_path):
+        try:
+            os.remove(_header_path(dataset_path))
+            print("[INFO] Galerie compilée marquée obsolète (recompilation au prochain chargement)")
+        except FileNotFoundError:
+            pass
+
+
+def _read_student_embeddings(dataset_path):
+    """
+    Parcourt dataset/etudiant_<id>/embeddings.json, retourne (ids, vecteurs, dates
+    de modification relevées avant lecture).
+    """
+    ids = []
+    vectors = []
+    stamps = {}
+
+    for student_folder in sorted(os.listdir(dataset_path)):
+        if not student_folder.startswith("etudiant_"):
+            continue
+        embedding_file = os.path.join(dataset_path, student_folder, "embeddings.json")
+        if not os.path.isfile(embedding_file):
+            continue
+        # Date relevée avant la lecture : une écriture concurrente rend la galerie obsolète
+        stamp = _source_stamp(embedding_file)
+        try:
+            student_id = int(student_folder.split("_")[1])
+            with open(embedding_file, "r") as f:
+                data = json.load(f)
+        except (ValueError, OSError) as e:
+            print(f"[WARN] Embedding ignoré pour {student_folder}: {e}")
+            continue
+
+        ids.append(student_id)
+        vectors.append(np.asarray(data["embedding"], dtype=np.float32))
+        stamps[student_folder.split("_", 1)[1]] = stamp
+
+    return ids, vectors, stamps
+
+
+def compile_gallery(dataset_path=DATASET_PATH, model_name=MODEL_NAME):
+    """
+    Compile tous les embeddings.json du dataset dans la galerie binaire.
+
+    Returns:
+        dict: l'en-tête écrit, ou None si le dossier dataset est introuvable
+    """
+    if not os.path.isdir(dataset_path):
+        print(f"[ERROR] Dossier dataset introuvable à {dataset_path}")
+        return None
+
+    ids, vectors, stamps = _read_student_embeddings(dataset_path)
+    return write_gallery(ids, vectors, dataset_path, model_name, sources=stamps)
+
+
+def write_gallery(ids, vectors, dataset_path=DATASET_PATH, model_name=MODEL_NAME, sources=None):
+    """
+    Écrit une galerie compilée complète (nouvelle génération) à partir
+    d'embeddings déjà en mémoire, normalisés par blocs de WRITE_CHUNK lignes.
+
+    Args:
+        sources: dates des embeddings.json compilés (voir dataset_stamps) ;
+            None = relevées maintenant pour ids
+
+    Returns:
+        dict: l'en-tête écrit
+    """
+    ids = [int(student_id) for student_id in ids]
+    dim = len(vectors[0]) if len(ids) else 512
+
+    with _gallery_lock(dataset_path):
+        old_header = _read_header(dataset_path)
+        capacity = max(MIN_CAPACITY, 2 * len(ids))
+        generation, filename, mmap = _new_vectors_file(dataset_path, old_header, capacity, dim)
+        for start in range(0, len(ids), WRITE_CHUNK):
+            end = min(start + WRITE_CHUNK, len(ids))
+            mmap[start:end] = GalleryMatcher.normalize(vectors[start:end])
+        mmap.flush()
+        del mmap
+
+        header = {
+            "format": FORMAT_VERSION,
+            "model": model_name,
+            "dim": int(dim),
+            "count": len(ids),
+            "capacity": capacity,
+            "generation": generation,
+            "vectors_file": filename,
+            "ids": ids,
+            "sources": sources if sources is not None else _stamps_for(dataset_path, ids)
+        }
+        _write_header(dataset_path, header)
+
+        if old_header and old_header.get("vectors_file") != filename:
+            _remove_old_vectors_file(dataset_path, old_header.get("vectors_file"))
+
+    print(f"[INFO] Galerie compilée : {len(ids)} étudiants ({filename})")
+    return header
+
+
+def _stamps_for(dataset_path, ids):
+    stamps = {}
+    for student_id in ids:
+        stamp = _source_stamp(_embedding_file(dataset_path, student_id))
+        if stamp is not None:
+            stamps[str(student_id)] = stamp
+    return stamps
+
+
+def _set_source_stamp(dataset_path, header, student_id):
+    sources = header.setdefault("sources", {})
+    stamp = _source_stamp(_embedding_file(dataset_path, student_id))
+    if stamp is None:
+        sources.pop(str(student_id), None)
+    else:
+        sources[str(student_id)] = stamp
+
+
+def load_compiled_gallery(dataset_path=DATASET_PATH, model_name=MODEL_NAME):
+    """
+    Charge la galerie compilée en mmap (sans copie ni parsing JSON des vecteurs).
+
+    Returns:
+        GalleryMatcher, ou None si la galerie n'existe pas ou vient d'un autre modèle
+    """
+    # Sous verrou : en-tête et génération du fichier lus ensemble
+    with _gallery_lock(dataset_path):
+        header = _read_header(dataset_path)
+        if header is None or header.get("model") != model_name:
+            return None
+
+        vectors_path = os.path.join(dataset_path, header["vectors_file"])
+        if not os.path.isfile(vectors_path):
+            return None
+
+        count = header["count"]
+        vectors = np.load(vectors_path, mmap_mode="r")
+    return GalleryMatcher(header["ids"], vectors[:count], normalized=True)
+
+
+def load_or_compile_gallery(dataset_path=DATASET_PATH, model_name=MODEL_NAME):
+    """Charge la galerie compilée, en la (re)compilant d'abord si absente ou obsolète."""
+    if not is_stale(dataset_path, model_name):
+        matcher = load_compiled_gallery(dataset_path, model_name)
+        if matcher is not None:
+            return matcher
+
+    print("[INFO] Galerie compilée absente ou obsolète, compilation...")
+    if compile_gallery(dataset_path, model_name) is None:
+        return GalleryMatcher.empty()
+    return load_compiled_gallery(dataset_path, model_name) or GalleryMatcher.empty()
+
+
+def _copy_generation(dataset_path, header, capacity, rows):
+    """
+    Nouvelle génération du fichier de vecteurs (copie-sur-écriture) : rows
+    = lignes de l'ancien fichier à garder, dans l'ordre. L'ancien fichier
+    reste valide pour les galeries déjà chargées ; l'en-tête est à réécrire.
+
+    Returns:
+        (génération, nom du fichier, mmap r+ de la nouvelle génération)
+    """
+    old_path = os.path.join(dataset_path, header["vectors_file"])
+    old = np.load(old_path, mmap_mode="r")
+    generation, filename, mmap = _new_vectors_file(dataset_path, header, capacity, header["dim"])
+    for start in range(0, len(rows), WRITE_CHUNK):
+        chunk = rows[start:start + WRITE_CHUNK]
+        mmap[start:start + len(chunk)] = old[chunk]
+    del old
+    return generation, filename, mmap
+
+
+def upsert_embedding(student_id, embedding, dataset_path=DATASET_PATH, model_name=MODEL_NAME):
+    """
+    Ajoute ou remplace l'embedding d'un étudiant dans la galerie compilée.
+
+    Un ajout écrit la ligne suivante du fichier courant (invisible des
+    galeries déjà chargées) ; un remplacement ou un dépassement de capacité
+    crée une nouvelle génération.
+
+    Si la galerie n'existe pas encore (ou vient d'un autre modèle), elle est
+    compilée entièrement depuis le dataset (qui contient déjà ce nouvel embedding).
+    """
+    vector = GalleryMatcher.normalize(embedding)[0]
+
+    with _gallery_lock(dataset_path):
+        header = _read_header(dataset_path)
+        if header is None or header.get("model") != model_name or header["dim"] != vector.shape[0]:
+            header = None
+
+        if header is not None:
+            ids = header["ids"]
+            count = header["count"]
+            old_file = header["vectors_file"]
+
+            if student_id in ids:
+                # Remplacement : copie, la ligne d'une galerie chargée ne change pas
+                generation, filename, mmap = _copy_generation(
+                    dataset_path, header, header["capacity"], list(range(count))
+                )
+                mmap[ids.index(student_id)] = vector
+            elif count < header["capacity"]:
+                mmap = np.load(os.path.join(dataset_path, old_file), mmap_mode="r+")
+                mmap[count] = vector
+                filename = old_file
+                ids = ids + [student_id]
+            else:
+                # Capacité atteinte : nouvelle génération deux fois plus grande
+                capacity = max(MIN_CAPACITY, 2 * header["capacity"])
+                generation, filename, mmap = _copy_generation(
+                    dataset_path, header, capacity, list(range(count))
+                )
+                mmap[count] = vector
+                header["capacity"] = capacity
+                ids = ids + [student_id]
+            mmap.flush()
+            del mmap
+
+            if filename != old_file:
+                header.update(generation=generation, vectors_file=filename)
+            header["ids"] = ids
+            header["count"] = len(ids)
+            _set_source_stamp(dataset_path, header, student_id)
+            _write_header(dataset_path, header)
+            if filename != old_file:
+                _remove_old_vectors_file(dataset_path, old_file)
+            return header
+
+    return compile_gallery(dataset_path, model_name)
+
+
+def remove_embedding(student_id, dataset_path=DATASET_PATH):
+    """
+    Retire un étudiant de la galerie compilée (nouvelle génération sans sa
+    ligne, pas de recompilation depuis le dataset).
+
+    Returns:
+        bool: True si l'étudiant était présent dans la galerie
+    """
+    with _gallery_lock(dataset_path):
+        header = _read_header(dataset_path)
+        if header is None or student_id not in header["ids"]:
+            return False
+
+        ids = header["ids"]
+        row = ids.index(student_id)
+        old_file = header["vectors_file"]
+        rows = [i for i in range(header["count"]) if i != row]
+        generation, filename, mmap = _copy_generation(dataset_path, header, header["capacity"], rows)
+        mmap.flush()
+        del mmap
+
+        header.update(generation=generation, vectors_file=filename,
+                      ids=ids[:row] + ids[row + 1:], count=len(rows))
+        header.get("sources", {}).pop(str(student_id), None)
+        _write_header(dataset_path, header)
+        _remove_old_vectors_file(dataset_path, old_file)
+        return True
+
+
+if __name__ == "__main__":
+    compile_gallery()
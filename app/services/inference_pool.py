@@ -0,0 +1,209 @@
+# app/services/inference_pool.py
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import Future
+
+import numpy as np
+
+INFERENCE_WORKERS = 1  # threads d'inférence partagés par toutes les sessions
+BATCH_MAX_SIZE = 32  # visages max par appel du modèle d'embedding
+BATCH_MAX_WAIT_MS = 20  # attente max pour compléter un batch avec d'autres salles
+
+# Travail en attente : batchable = embedding de visages (args = (faces,)),
+# regroupable avec les travaux des autres sessions qui ont la même fonction
+_Job = namedtuple("_Job", ["future", "fn", "args", "batchable", "submitted"])
+
+
+class InferencePool:
+    """
+    Inférence (détection + embedding) partagée entre les scans en parallèle.
+
+    Chaque session a sa propre file de travaux ; les workers servent les
+    sessions à tour de rôle (round-robin), une salle très fréquentée ne peut
+    donc pas affamer les autres. Les modèles restent chargés une seule fois.
+
+    Les embeddings de toutes les salles sont regroupés (batching dynamique) :
+    un batch part dès qu'il atteint batch_max_size visages, ou après
+    batch_max_wait_ms si d'autres sessions peuvent encore le compléter.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, batch_max_size=BATCH_MAX_SIZE,
+                 batch_max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.workers = max(1, workers)
+        self.batch_max_size = max(1, batch_max_size)
+        self.batch_max_wait = batch_max_wait_ms / 1000.0
+        self._condition = threading.Condition()
+        self._queues = OrderedDict()  # clé de session -> deque de _Job
+        self._threads = []
+        self.batches = 0  # appels du modèle d'embedding
+        self.batched_faces = 0
+        self.batched_jobs = 0
+
+    def client(self, key, face_pipeline):
+        """Pipeline de visages d'une session, exécuté par le pool."""
+        self._ensure_started()
+        with self._condition:
+            self._queues.setdefault(key, deque())
+        return PooledFacePipeline(self, key, face_pipeline)
+
+    def submit(self, key, fn, *args):
+        return self._submit(key, fn, args, batchable=False)
+
+    def submit_batch(self, key, fn, faces):
+        """
+        Embedding de visages, regroupé avec les autres sessions.
+        fn(faces) doit retourner un tableau (n_visages, dim).
+        """
+        return self._submit(key, fn, (list(faces),), batchable=True)
+
+    def _submit(self, key, fn, args, batchable):
+        future = Future()
+        with self._condition:
+            self._queues.setdefault(key, deque()).append(
+                _Job(future, fn, args, batchable, time.monotonic())
+            )
+            self._condition.notify_all()
+        return future
+
+    def release(self, key):
+        """Fin d'une session : ses travaux en attente sont annulés."""
+        with self._condition:
+            jobs = self._queues.pop(key, deque())
+        for job in jobs:
+            job.future.cancel()
+
+    def pending(self):
+        """Travaux en attente par session."""
+        with self._condition:
+            return {key: len(jobs) for key, jobs in self._queues.items()}
+
+    def stats(self):
+        return {
+            "sessions": len(self._queues),
+            "batches": self.batches,
+            "avg_batch_faces": round(self.batched_faces / self.batches, 2) if self.batches else None,
+            "avg_batch_sessions": round(self.batched_jobs / self.batches, 2) if self.batches else None
+        }
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _next_job(self):
+        """Prochain travail, en passant à la session suivante à chaque fois."""
+        for _ in range(len(self._queues)):
+            key, jobs = next(iter(self._queues.items()))
+            self._queues.move_to_end(key)
+            if jobs:
+                return jobs.popleft()
+        return None
+
+    def _take_batchable(self, fn, batch, room):
+        """
+        Ajoute au batch les embeddings en tête de file des autres sessions
+        (même fonction, tant qu'il reste de la place). Retourne le nombre de
+        visages ajoutés.
+        """
+        added = 0
+        for key in list(self._queues):
+            jobs = self._queues[key]
+            if not jobs:
+                continue
+            job = jobs[0]
+            faces = len(job.args[0]) if job.batchable else 0
+            if not job.batchable or job.fn != fn or faces > room - added:
+                continue
+            jobs.popleft()
+            self._queues.move_to_end(key)
+            batch.append(job)
+            added += faces
+        return added
+
+    def _collect_batch(self, first):
+        """Complète un batch d'embeddings (appelé avec le verrou)."""
+        batch = [first]
+        size = len(first.args[0])
+        deadline = first.submitted + self.batch_max_wait
+
+        while size < self.batch_max_size:
+            size += self._take_batchable(first.fn, batch, self.batch_max_size - size)
+            if size >= self.batch_max_size:
+                break
+            # Attendre seulement si une autre session peut encore compléter le batch
+            if len(self._queues) <= len(batch):
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._condition.wait(remaining)
+        return batch
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                batch = self._collect_batch(job) if job.batchable else None
+
+            if batch is None:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    job.future.set_result(job.fn(*job.args))
+                except Exception as e:
+                    job.future.set_exception(e)
+            else:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        """Un seul appel du modèle pour le batch, résultats renvoyés à chaque session."""
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        faces = [face for job in batch for face in job.args[0]]
+        try:
+            embeddings = np.asarray(batch[0].fn(faces)) if faces else None
+        except Exception as e:
+            for job in batch:
+                job.future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batched_faces += len(faces)
+        self.batched_jobs += len(batch)
+
+        start = 0
+        for job in batch:
+            count = len(job.args[0])
+            if count == 0:
+                job.future.set_result(np.empty((0, 0), dtype=np.float32))
+            else:
+                job.future.set_result(embeddings[start:start + count])
+            start += count
+
+
+class PooledFacePipeline:
+    """Même interface que FacePipeline (detect, embed_batch), via le pool."""
+
+    def __init__(self, pool, key, face_pipeline):
+        self.pool = pool
+        self.key = key
+        self.face_pipeline = face_pipeline
+
+    def detect(self, frame):
+        return self.pool.submit(self.key, self.face_pipeline.detect, frame).result()
+
+    def embed_batch(self, faces):
+        return self.pool.submit_batch(self.key, self.face_pipeline.embed_batch, faces).result()
+
+    def close(self):
+        self.pool.release(self.key)
@@ -0,0 +1,175 @@
+# app/services/overlay_renderer.py
+"""
+Dessin de l'aperçu du scan (fenêtre OpenCV et flux /scan/<id>/stream).
+
+Niveaux (SCAN_RENDER_LEVEL) :
+    - "off"     : aucun dessin, la frame est affichée / diffusée telle quelle
+                  (headless, benchmarks)
+    - "minimal" : cadres, étiquettes, panneau de statistiques, FPS, légende
+    - "full"    : en plus, cadre intérieur, coins, repères faciaux détectés
+                  et pulsation des visages reconnus
+
+Seules les zones sous les étiquettes et le panneau sont assombries (pas de
+copie ni de fusion de la frame entière), les tailles de texte sont mises en
+cache et tout est dessiné en un seul passage sur la frame.
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+RENDER_LEVELS = ("off", "minimal", "full")
+DEFAULT_RENDER_LEVEL = "full"
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_ALPHA = 0.6  # opacité du fond des étiquettes
+PANEL_ALPHA = 0.7  # opacité du panneau de statistiques
+PANEL_SIZE = (300, 110)  # largeur, hauteur
+PULSE_STEP = 0.05
+CORNER_LENGTH = 15
+INNER_MARGIN = 5
+
+LEGEND_TEXTS = (
+    "ROUGE: Visage détecté",
+    "VERT: Étudiant reconnu",
+    "JAUNE: Points de reconnaissance"
+)
+
+
+@lru_cache(maxsize=1024)
+def text_size(text, scale, thickness):
+    """cv2.getTextSize mis en cache (étiquettes et panneau se répètent d'une frame à l'autre)."""
+    return cv2.getTextSize(text, FONT, scale, thickness)[0]
+
+
+def darken(frame, x1, y1, x2, y2, alpha):
+    """
+    Fond noir semi-transparent sur le rectangle (x1, y1)-(x2, y2), limité à la
+    frame : même rendu qu'un rectangle plein fusionné avec addWeighted, mais
+    seuls les pixels de la zone sont touchés.
+    """
+    height, width = frame.shape[:2]
+    x1, x2 = max(0, x1), min(width, x2)
+    y1, y2 = max(0, y1), min(height, y2)
+    if x1 >= x2 or y1 >= y2:
+        return
+    roi = frame[y1:y2, x1:x2]
+    np.multiply(roi, 1.0 - alpha, out=roi, casting="unsafe")
+
+
+class OverlayRenderer:
+    """Dessine les visages, les statistiques et la légende d'un scan ; une instance par scan."""
+
+    def __init__(self, level=None):
+        level = level or DEFAULT_RENDER_LEVEL
+        if level not in RENDER_LEVELS:
+            raise ValueError(f"Niveau de rendu inconnu: {level} (attendu: {', '.join(RENDER_LEVELS)})")
+        self.level = level
+        self.pulse_factor = 0.0
+        self._pulse_direction = 1
+
+    @property
+    def enabled(self):
+        return self.level != "off"
+
+    def _advance_pulse(self):
+        self.pulse_factor += self._pulse_direction * PULSE_STEP
+        if self.pulse_factor > 1.0:
+            self.pulse_factor = 1.0
+            self._pulse_direction = -1
+        elif self.pulse_factor < 0.0:
+            self.pulse_factor = 0.0
+            self._pulse_direction = 1
+
+    def draw(self, frame, faces_info, stats, cours_session_id, gallery_size, fps, running=True):
+        """Dessine l'aperçu sur frame (en place) ; sans effet au niveau "off"."""
+        if not self.enabled:
+            return frame
+
+        full = self.level == "full"
+        if full:
+            self._advance_pulse()
+
+        darken(frame, 0, 0, PANEL_SIZE[0], PANEL_SIZE[1], PANEL_ALPHA)
+        for face in faces_info:
+            self._draw_face(frame, face, full)
+        self._draw_panel(frame, stats, cours_session_id, gallery_size, fps, running)
+        self._draw_legend(frame, LEGEND_TEXTS if full else LEGEND_TEXTS[:2])
+        return frame
+
+    def _draw_face(self, frame, face, full):
+        x, y, w, h, student_id, dist, is_recognized, landmarks = face
+        recognized = student_id is not None and is_recognized
+
+        # Vert (reconnu) ou rouge (inconnu), avec pulsation au niveau "full"
+        if recognized:
+            pulse = int(50 * self.pulse_factor)
+            color = (min(255, pulse), 255 - pulse, 0)
+            label = f"✓ ID: {student_id} ({dist:.2f})"
+        else:
+            pulse = int(30 * self.pulse_factor)
+            color = (0, 0, min(255, 255 + pulse))
+            label = "Inconnu"
+
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3)
+
+        if full:
+            cv2.rectangle(frame, (x + INNER_MARGIN, y + INNER_MARGIN),
+                          (x + w - INNER_MARGIN, y + h - INNER_MARGIN), color, 1)
+            self._draw_corners(frame, x, y, w, h, color)
+            # Repères faciaux fournis par le détecteur (coordonnées relatives au visage)
+            if landmarks and len(landmarks) >= 2:
+                for landmark_x, landmark_y in landmarks:
+                    center = (x + landmark_x, y + landmark_y)
+                    cv2.circle(frame, center, 4, (0, 255, 255), -1)
+                    cv2.circle(frame, center, 6, color, 1)
+                if len(landmarks) >= 4:
+                    cv2.line(frame, (x + landmarks[0][0], y + landmarks[0][1]),
+                             (x + landmarks[1][0], y + landmarks[1][1]), (255, 255, 0), 1, cv2.LINE_AA)
+            if recognized:
+                cv2.circle(frame, (x + w - 15, y + 15), int(10 + 5 * self.pulse_factor), (0, 255, 0), 2)
+
+        # Étiquette sur fond assombri
+        text_w, text_h = text_size(label, 0.6, 2)
+        text_y = y - 10 if y > 30 else y + h + 20
+        darken(frame, x - 5, text_y - text_h - 5, x + text_w + 5, text_y + 5, LABEL_ALPHA)
+        cv2.putText(frame, label, (x, text_y), FONT, 0.6, (255, 255, 255), 2)
+
+    @staticmethod
+    def _draw_corners(frame, x, y, w, h, color):
+        for corner_x, corner_y, dx, dy in ((x, y, 1, 1), (x + w, y, -1, 1),
+                                           (x, y + h, 1, -1), (x + w, y + h, -1, -1)):
+            cv2.line(frame, (corner_x, corner_y), (corner_x + dx * CORNER_LENGTH, corner_y), color, 2)
+            cv2.line(frame, (corner_x, corner_y), (corner_x, corner_y + dy * CORNER_LENGTH), color, 2)
+
+    @staticmethod
+    def _draw_panel(frame, stats, cours_session_id, gallery_size, fps, running):
+        info_texts = (
+            f"SESSION: {cours_session_id}",
+            f"DÉTECTIONS: {stats.unique_detections}/{gallery_size}",
+            f"TOTAL SCANS: {stats.total_detections}",
+            f"STATUT: {'ACTIF' if running else 'ARRÊTÉ'}",
+            "APPUYEZ SUR 'Q' POUR QUITTER"
+        )
+        y_offset = 25
+        for i, text in enumerate(info_texts):
+            if i == 0:
+                cv2.putText(frame, text, (10, y_offset), FONT, 0.7, (0, 255, 0), 2)
+            else:
+                cv2.putText(frame, text, (10, y_offset), FONT, 0.6, (255, 255, 255), 1)
+            y_offset += 22
+
+        # FPS en haut à droite
+        fps_color = (0, 255, 0) if fps > 15 else (0, 165, 255) if fps > 10 else (0, 0, 255)
+        fps_text = f"FPS: {fps}"
+        fps_w, fps_h = text_size(fps_text, 0.7, 2)
+        right = frame.shape[1]
+        cv2.rectangle(frame, (right - fps_w - 25, 5), (right - 5, fps_h + 25), (0, 0, 0), -1)
+        cv2.putText(frame, fps_text, (right - fps_w - 15, 35), FONT, 0.7, fps_color, 2)
+
+    @staticmethod
+    def _draw_legend(frame, legend_texts):
+        legend_y = frame.shape[0] - 10
+        for text in reversed(legend_texts):
+            cv2.putText(frame, text, (10, legend_y), FONT, 0.5, (200, 200, 200), 1)
+            legend_y -= 20
@@ -0,0 +1,211 @@
+# app/services/presence_writer.py
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.dialects import mysql, sqlite
+
+from app.database.connDB import db
+from app.models.attendance import PresenceModel
+from app.models.course_session import CoursSessionModel
+from app.models.student import EtudiantModel
+
+FLUSH_INTERVAL_MS = 500  # écriture au plus tard toutes les N ms
+FLUSH_SIZE = 20  # ... ou dès que N présences sont en attente
+
+
+class PresenceWriter:
+    """
+    Écriture asynchrone et groupée des présences reconnues pendant un scan.
+
+    La session et la liste des étudiants valides sont chargées une seule fois
+    (load()) ; un étudiant inscrit pendant le scan est cherché en base à sa
+    première reconnaissance. Les reconnaissances arrivent par submit() et sont écrites en une
+    seule transaction toutes les flush_interval_ms ms ou tous les flush_size
+    évènements : la boucle de scan n'attend jamais MySQL.
+    """
+
+    def __init__(self, cours_session_id, app=None, flush_interval_ms=None,
+                 flush_size=None, on_recorded=None, on_failed=None, on_flushed=None):
+        """
+        Args:
+            cours_session_id: session de cours scannée
+            app: application Flask (contexte pour le thread d'écriture)
+            flush_interval_ms, flush_size: None = FLUSH_INTERVAL_MS, FLUSH_SIZE
+            on_recorded: appelé avec (etudiant_id, distance) après le commit
+            on_failed: appelé avec etudiant_id si l'écriture a échoué (nouvel essai possible)
+            on_flushed: appelé avec (nombre de présences, durée en s) après chaque transaction
+        """
+        self.cours_session_id = cours_session_id
+        self.app = app
+        self.flush_interval = (flush_interval_ms or FLUSH_INTERVAL_MS) / 1000.0
+        self.flush_size = flush_size or FLUSH_SIZE
+        self.on_recorded = on_recorded
+        self.on_failed = on_failed
+        self.on_flushed = on_flushed
+
+        self.session_info = None
+        self.roster = set()
+
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """
+        Charge la session et les étudiants valides (une fois par scan).
+        À appeler dans un contexte d'application.
+
+        Returns:
+            bool: False si la session n'existe pas
+        """
+        session = db.session.get(CoursSessionModel, self.cours_session_id)
+        if not session:
+            print(f"[ERROR] Session {self.cours_session_id} non trouvée dans la table cours_session")
+            return False
+
+        self.session_info = {
+            "id": session.id,
+            "date": session.date,
+            "seance": session.seance,
+            "cours": session.cours.nom if session.cours else "N/A",
+            "filiere": session.cours.filiere if session.cours else None
+        }
+        self.roster = {row.id for row in db.session.query(EtudiantModel.id).all()}
+
+        print(f"[PRESENCE] Session trouvée: ID {session.id}, Date: {session.date}, "
+              f"Séance: {session.seance} ({len(self.roster)} étudiants)")
+        return True
+
+    def submit(self, etudiant_id, distance=None):
+        """Ajoute une reconnaissance à écrire (ne bloque pas)."""
+        self._queue.put((etudiant_id, distance))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scan-persist", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Arrête le writer après avoir écrit les présences en attente."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        if self.app is not None:
+            with self.app.app_context():
+                self._loop()
+        else:
+            self._loop()
+
+    def _loop(self):
+        batch = []
+        deadline = None
+
+        # Après l'arrêt, on vide la file pour ne perdre aucune présence
+        while not self._stop_event.is_set() or not self._queue.empty() or batch:
+            timeout = 0.2 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            except queue.Empty:
+                pass
+
+            if not batch:
+                continue
+
+            if (len(batch) >= self.flush_size or time.monotonic() >= deadline
+                    or (self._stop_event.is_set() and self._queue.empty())):
+                self.flush(batch)
+                batch = []
+                deadline = None
+
+    def flush(self, batch):
+        """
+        Écrit un lot de présences en une seule requête : INSERT groupé qui
+        passe à 'P' les présences déjà existantes (clé unique étudiant +
+        séance), sans fenêtre entre lecture et écriture avec un autre scan.
+        """
+        distances = {}
+        for etudiant_id, distance in batch:
+            distances.setdefault(etudiant_id, distance)
+
+        # Étudiant absent de la liste chargée : inscrit pendant le scan ou
+        # inexistant ; sinon rejeté (on_failed : nouvel essai à la prochaine reconnaissance)
+        for etudiant_id in self._refresh_roster([i for i in distances if i not in self.roster]):
+            print(f"[ERROR] Étudiant {etudiant_id} non trouvé")
+            distances.pop(etudiant_id)
+            self._notify_failed(etudiant_id)
+
+        if not distances:
+            return
+
+        ids = list(distances)
+        started = time.perf_counter()
+        try:
+            now = datetime.now()
+            rows = [
+                {"etudiant_id": i, "cours_session_id": self.cours_session_id, "statut": 'P',
+                 "date_enregistrement": now, "date_mise_a_jour": now}
+                for i in ids
+            ]
+            db.session.execute(self._upsert_statement(rows))
+            db.session.commit()
+            if self.on_flushed:
+                self.on_flushed(len(ids), time.perf_counter() - started)
+            print(f"[SUCCESS] {len(ids)} présence(s) enregistrée(s) pour la session {self.cours_session_id}")
+        except Exception as e:
+            print(f"[ERROR] Erreur lors de l'enregistrement groupé: {str(e)}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            for etudiant_id in ids:
+                self._notify_failed(etudiant_id)
+            return
+
+        if self.on_recorded:
+            for etudiant_id in ids:
+                self.on_recorded(etudiant_id, distances[etudiant_id])
+
+    @staticmethod
+    def _upsert_statement(rows):
+        """INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE (SQLite)."""
+        if db.session.get_bind().dialect.name == "mysql":
+            statement = mysql.insert(PresenceModel).values(rows)
+            return statement.on_duplicate_key_update(
+                statut=statement.inserted.statut,
+                date_mise_a_jour=statement.inserted.date_mise_a_jour
+            )
+        statement = sqlite.insert(PresenceModel).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[PresenceModel.etudiant_id, PresenceModel.cours_session_id],
+            set_={"statut": statement.excluded.statut,
+                  "date_mise_a_jour": statement.excluded.date_mise_a_jour}
+        )
+
+    def _refresh_roster(self, unknown_ids):
+        """
+        Cherche en base les étudiants absents de la liste chargée par load()
+        et les y ajoute. Retourne les identifiants toujours introuvables.
+        """
+        if not unknown_ids:
+            return []
+        try:
+            found = {row.id for row in db.session.query(EtudiantModel.id)
+                     .filter(EtudiantModel.id.in_(unknown_ids)).all()}
+        except Exception as e:
+            print(f"[ERROR] Recherche des étudiants {unknown_ids} impossible: {str(e)}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+            found = set()
+        self.roster |= found
+        return [i for i in unknown_ids if i not in found]
+
+    def _notify_failed(self, etudiant_id):
+        if self.on_failed:
+            self.on_failed(etudiant_id)
@@ -0,0 +1,293 @@
+# app/services/process_inference.py
+"""
+Inférence dans des processus séparés (un modèle par processus).
+
+Les frames sont copiées dans un anneau de mémoire partagée
+(multiprocessing.shared_memory) : seuls l'index du slot, la forme et le type
+passent par la file de travaux, jamais le tableau 640x480x3 lui-même. Les
+visages détectés et les embeddings, petits, reviennent par une file de résultats.
+
+Chaque processus limite ses threads TensorFlow / OpenCV / BLAS pour que
+N processus x T threads ne dépassent pas le nombre de cœurs.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_SLOTS = 8  # frames en cours de traitement au maximum
+SLOT_BYTES = 1920 * 1080 * 3  # taille max d'une frame dans l'anneau (Full HD BGR)
+START_TIMEOUT = 300  # secondes pour charger les modèles dans tous les processus
+TASK_TIMEOUT = 60  # secondes max par détection / embedding
+
+
+def limit_threads(threads):
+    """
+    Threads de calcul d'un processus worker. À appeler avant d'importer
+    TensorFlow (les variables d'environnement sont lues à l'initialisation).
+    """
+    threads = str(max(1, threads))
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+    try:
+        import cv2
+        cv2.setNumThreads(int(threads))
+    except ImportError:
+        pass
+
+
+def default_pipeline_factory(model_name, detector_backend):
+    from app.services.face_pipeline import FacePipeline
+    return FacePipeline(model_name, detector_backend)
+
+
+def _worker_main(shm_name, slot_bytes, tasks, results, threads, pipeline_factory, factory_args):
+    """Boucle d'un processus worker : détection / embedding à la demande."""
+    limit_threads(threads)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        try:
+            pipeline = pipeline_factory(*factory_args)
+            start = time.perf_counter()
+            pipeline.warmup()
+        except Exception as e:
+            results.put(("error", os.getpid(), f"{type(e).__name__}: {e}"))
+            return
+        results.put(("ready", os.getpid(), round((time.perf_counter() - start) * 1000.0, 1)))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, kind, payload = task
+            try:
+                if kind == "detect":
+                    slot, shape, dtype = payload
+                    frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf,
+                                       offset=slot * slot_bytes)
+                    result = [tuple(face) for face in pipeline.detect(frame)]
+                elif kind == "detect_frame":
+                    result = [tuple(face) for face in pipeline.detect(payload)]
+                else:
+                    result = pipeline.embed_batch(payload)
+                results.put((task_id, True, result))
+            except Exception as e:
+                results.put((task_id, False, f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+class ProcessInferencePool:
+    """
+    Pool de processus d'inférence, avec la même interface que FacePipeline
+    (warmup, detect, embed_batch, ready, warmup_ms). Les travaux vont au
+    premier processus libre ; InferencePool garde l'équité entre sessions et
+    le batching (un thread de dispatch par processus).
+    """
+
+    def __init__(self, processes, threads_per_worker=None, ring_slots=RING_SLOTS,
+                 slot_bytes=SLOT_BYTES, model_name=None, detector_backend=None,
+                 pipeline_factory=default_pipeline_factory, task_timeout=TASK_TIMEOUT,
+                 start_timeout=START_TIMEOUT):
+        self.processes = max(1, processes)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.processes)
+        self.ring_slots = ring_slots
+        self.slot_bytes = slot_bytes
+        self.task_timeout = task_timeout
+        self.start_timeout = start_timeout
+        self.pipeline_factory = pipeline_factory
+        self.factory_args = (model_name, detector_backend)
+
+        self.ready = False
+        self.warmup_ms = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._futures = {}
+        self._task_slots = {}  # slot de l'anneau lu par chaque travail en cours
+        self._free_slots = queue.Queue()
+        self._shm = None
+        self._workers = []
+        self._atexit_registered = False
+
+    def warmup(self):
+        """Démarre les processus et attend que tous aient chargé les modèles."""
+        with self._start_lock:
+            if self.ready:
+                return self.warmup_ms
+
+            print(f"[INFO] Démarrage de {self.processes} processus d'inférence "
+                  f"({self.threads_per_worker} threads chacun)...")
+            start = time.perf_counter()
+            # Processus et mémoire partagée libérés à l'arrêt de l'application
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+            # spawn : pas de fork d'un processus qui a déjà des threads / TensorFlow
+            ctx = multiprocessing.get_context("spawn")
+            self._shm = shared_memory.SharedMemory(create=True, size=self.ring_slots * self.slot_bytes)
+            self._free_slots = queue.Queue()
+            for slot in range(self.ring_slots):
+                self._free_slots.put(slot)
+            self._tasks = ctx.Queue()
+            self._results = ctx.Queue()
+
+            try:
+                for i in range(self.processes):
+                    process = ctx.Process(
+                        target=_worker_main,
+                        args=(self._shm.name, self.slot_bytes, self._tasks, self._results,
+                              self.threads_per_worker, self.pipeline_factory, self.factory_args),
+                        name=f"inference-worker-{i}",
+                        daemon=True
+                    )
+                    process.start()
+                    self._workers.append(process)
+
+                for _ in range(self.processes):
+                    message = self._results.get(timeout=self.start_timeout)
+                    if message[0] != "ready":
+                        raise RuntimeError(f"Processus d'inférence non démarré: {message}")
+            except BaseException:
+                # Pas de processus ni de segment orphelins ; un nouvel essai repart de zéro
+                self._shutdown(graceful=False)
+                raise
+
+            threading.Thread(target=self._collect_results, name="inference-results", daemon=True).start()
+            self.warmup_ms = round((time.perf_counter() - start) * 1000.0, 1)
+            self.ready = True
+            print(f"[INFO] Processus d'inférence prêts en {self.warmup_ms} ms")
+            return self.warmup_ms
+
+    def _submit(self, kind, payload, slot=None):
+        """Envoie un travail ; slot est rendu à l'anneau quand le worker a répondu."""
+        future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            self._futures[task_id] = future
+            if slot is not None:
+                self._task_slots[task_id] = slot
+        try:
+            self._tasks.put((task_id, kind, payload))
+        except BaseException:
+            self._forget(task_id)
+            raise
+        return task_id, future
+
+    def _forget(self, task_id):
+        with self._lock:
+            self._futures.pop(task_id, None)
+            slot = self._task_slots.pop(task_id, None)
+        if slot is not None:
+            self._free_slots.put(slot)
+
+    def _wait(self, task_id, future):
+        """
+        Résultat d'un travail. Après task_timeout secondes, le travail est
+        abandonné ; son slot reste réservé jusqu'à la réponse du worker, qui
+        peut encore être en train de le lire.
+        """
+        try:
+            return future.result(self.task_timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._futures.pop(task_id, None)
+            raise TimeoutError(f"Travail d'inférence {task_id} sans réponse après {self.task_timeout} s")
+
+    def _collect_results(self):
+        results = self._results
+        while True:
+            try:
+                message = results.get()
+            except (EOFError, OSError):
+                return
+            if message is None:  # close()
+                return
+            task_id, ok, result = message
+            with self._lock:
+                future = self._futures.pop(task_id, None)
+                slot = self._task_slots.pop(task_id, None)
+            # Le worker a fini de lire le slot : il peut resservir
+            if slot is not None:
+                self._free_slots.put(slot)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def detect(self, frame):
+        from app.services.face_pipeline import DetectedFace
+        self.warmup()
+
+        frame = np.ascontiguousarray(frame)
+        if frame.nbytes > self.slot_bytes:
+            # Frame trop grande pour l'anneau : envoyée telle quelle (copie)
+            faces = self._wait(*self._submit("detect_frame", frame))
+            return [DetectedFace(*face) for face in faces]
+
+        try:
+            slot = self._free_slots.get(timeout=self.task_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"Aucun slot libre dans l'anneau après {self.task_timeout} s")
+        try:
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf,
+                              offset=slot * self.slot_bytes)
+            view[...] = frame
+        except BaseException:
+            self._free_slots.put(slot)
+            raise
+        faces = self._wait(*self._submit("detect", (slot, frame.shape, frame.dtype.str), slot=slot))
+        return [DetectedFace(*face) for face in faces]
+
+    def embed_batch(self, faces):
+        self.warmup()
+        return self._wait(*self._submit("embed", list(faces)))
+
+    def close(self):
+        """Arrête les processus et libère la mémoire partagée (appelé aussi à la sortie)."""
+        with self._start_lock:
+            self._shutdown(graceful=True)
+
+    def _shutdown(self, graceful):
+        """Arrête les workers (terminate si graceful est faux), supprime le segment partagé."""
+        if graceful and self._workers:
+            for _ in self._workers:
+                self._tasks.put(None)
+            self._results.put(None)  # fin du thread de collecte
+        for process in self._workers:
+            if graceful:
+                process.join(5)
+            if process.is_alive():
+                process.terminate()
+                process.join(5)
+        self._workers = []
+
+        with self._lock:
+            pending = list(self._futures.values())
+            self._futures.clear()
+            self._task_slots.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Pool d'inférence arrêté"))
+
+        if self._shm is not None:
+            self._shm.close()
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None
+        self.ready = False
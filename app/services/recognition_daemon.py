@@ -0,0 +1,188 @@
+# app/services/recognition_daemon.py
+"""
+Service de reconnaissance faciale dans un processus séparé.
+
+Il possède les modèles (TensorFlow) et les caméras ; les workers web lui
+envoient start/stop/status/events/metrics en HTTP local (RECOGNITION_DAEMON_URL),
+ainsi que /invalidate après chaque inscription, modification ou suppression
+d'étudiant (galerie rechargée par les scans en cours).
+Plusieurs sessions de cours peuvent être scannées en parallèle.
+
+    python -m app.services.recognition_daemon --port 5055 --warmup
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from app.config import Config
+from app.services.capture_sources import restrict_source
+from app.services.scan_backend import local_scan_backend
+from app.services.scan_stream import BOUNDARY
+
+DEFAULT_HOST = "127.0.0.1"  # local uniquement : aucune authentification
+DEFAULT_PORT = 5055
+MAX_EVENTS_WAIT = 30  # secondes d'attente max pour /events
+
+
+class RecognitionRequestHandler(BaseHTTPRequestHandler):
+    backend = local_scan_backend
+    # Sources autorisées (mêmes règles que /scan/start du worker web)
+    source_root = Config.SCAN_SOURCE_ROOT
+    allowed_streams = Config.SCAN_ALLOWED_STREAMS
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            cours_session_id = self._session_id(query.get("cours_session_id", [None])[0])
+        except ValueError:
+            self._send_json(400, {"error": "cours_session_id invalide"})
+            return
+
+        if url.path == "/status":
+            status = self.backend.status(cours_session_id)
+            if status is None:
+                self._send_json(404, {"error": f"Aucun scan pour la session {cours_session_id}"})
+            else:
+                self._send_json(200, status)
+        elif url.path == "/events":
+            try:
+                since = int(query.get("since", ["0"])[0])
+                timeout = min(float(query.get("timeout", ["0"])[0]), MAX_EVENTS_WAIT)
+            except ValueError:
+                self._send_json(400, {"error": "since et timeout doivent être des nombres"})
+                return
+            self._send_json(200, self.backend.events(since, timeout))
+        elif url.path == "/metrics":
+            self._send_json(200, self.backend.metrics())
+        elif url.path == "/stream":
+            self._send_stream(cours_session_id)
+        else:
+            self._send_json(404, {"error": f"Route inconnue: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/start":
+            self._start()
+        elif url.path == "/stop":
+            try:
+                cours_session_id = self._session_id(self._read_json().get("cours_session_id"))
+            except (ValueError, TypeError, AttributeError):
+                self._send_json(400, {"error": "cours_session_id invalide"})
+                return
+            self._send_json(200, {"message": "Scan arrêté",
+                                  "stopped": self.backend.stop(cours_session_id)})
+        elif url.path == "/invalidate":
+            try:
+                reason = self._read_json().get("reason")
+            except (ValueError, AttributeError):
+                self._send_json(400, {"error": "Corps JSON invalide"})
+                return
+            self._send_json(200, {"version": self.backend.invalidate_gallery(reason)})
+        else:
+            self._send_json(404, {"error": f"Route inconnue: {url.path}"})
+
+    @staticmethod
+    def _session_id(value):
+        return int(value) if value is not None else None
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _start(self):
+        try:
+            data = self._read_json()
+            cours_session_id = int(data["cours_session_id"])
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {"error": "cours_session_id manquant ou invalide"})
+            return
+
+        source = data.get("source", data.get("camera"))
+        try:
+            source = restrict_source(source, self.source_root, self.allowed_streams)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        ok, error = self.backend.start(cours_session_id, data.get("headless"), source=source)
+        if not ok:
+            self._send_json(400, {"error": error})
+            return
+        self._send_json(200, {"success": True, "cours_session_id": cours_session_id})
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, cours_session_id):
+        frames = self.backend.stream(cours_session_id)
+        if frames is None:
+            self._send_json(404, {"error": "Aucun scan pour cette session"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache, no-store")
+        self.end_headers()
+        try:
+            for chunk in frames:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client déconnecté
+
+    def log_message(self, format, *args):
+        print(f"[DAEMON] {self.address_string()} - {format % args}")
+
+
+def create_server(host=DEFAULT_HOST, port=DEFAULT_PORT, backend=None, config=None):
+    """
+    Serveur HTTP du service ; backend = local_scan_backend par défaut.
+    config : configuration Flask du service (SCAN_SOURCE_ROOT,
+    SCAN_ALLOWED_STREAMS), Config par défaut.
+    """
+    attributes = {}
+    if backend is not None:
+        attributes["backend"] = backend
+    if config is not None:
+        attributes["source_root"] = config.get("SCAN_SOURCE_ROOT")
+        attributes["allowed_streams"] = config.get("SCAN_ALLOWED_STREAMS")
+    handler = RecognitionRequestHandler
+    if attributes:
+        handler = type("RecognitionRequestHandler", (RecognitionRequestHandler,), attributes)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service de reconnaissance faciale")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--warmup", action="store_true",
+                        help="préchauffer les modèles avant le premier scan")
+    args = parser.parse_args(argv)
+
+    from app.services.facial_recognition import get_worker_app
+    config = get_worker_app().config
+    if args.warmup:
+        from app.services.recognition_service import RecognitionService
+        RecognitionService.start_warmup(config)
+
+    server = create_server(args.host, args.port, config=config)
+    print(f"[INFO] Service de reconnaissance sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Arrêt du service de reconnaissance")
+        local_scan_backend.stop()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
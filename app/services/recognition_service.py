@@ -0,0 +1,46 @@
+# app/services/recognition_service.py
+import sys
+
+# Module du scan : OpenCV, DeepFace et TensorFlow (plusieurs secondes, centaines de Mo)
+_SCAN_MODULE = "app.services.facial_recognition"
+
+
+class RecognitionService:
+    """
+    Façade de la reconnaissance faciale pour les contrôleurs.
+
+    Le module facial_recognition (et donc OpenCV, DeepFace, TensorFlow) n'est
+    importé qu'au premier scan ou préchauffage : un worker qui ne sert que
+    /students ou /attendance démarre sans charger la pile ML.
+    """
+
+    @staticmethod
+    def _module():
+        """Importe le module de scan (une seule fois)."""
+        from app.services import facial_recognition
+        return facial_recognition
+
+    @staticmethod
+    def is_loaded():
+        """True si la pile ML est déjà en mémoire."""
+        return _SCAN_MODULE in sys.modules
+
+    @staticmethod
+    def run_session(session, app=None):
+        """Exécute le scan d'une ScanSession (à appeler dans son thread)."""
+        return RecognitionService._module().run_face_scan_with_context(
+            session.cours_session_id, session.headless, app, session=session
+        )
+
+    @staticmethod
+    def start_warmup(config=None):
+        """Préchauffage des modèles en arrière-plan (charge la pile ML)."""
+        return RecognitionService._module().start_models_warmup(config)
+
+    @staticmethod
+    def get_models_status():
+        """État des modèles pour /scan/status, sans charger la pile ML."""
+        if not RecognitionService.is_loaded():
+            return {"models_ready": False, "warmup_ms": None,
+                    "inference_processes": 0, "inference": None}
+        return RecognitionService._module().get_models_status()
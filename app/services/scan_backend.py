@@ -0,0 +1,183 @@
+# app/services/scan_backend.py
+import json
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from app.config import Config
+from app.services.gallery_cache import gallery_cache
+from app.services.recognition_service import RecognitionService
+from app.services.scan_events import scan_events
+from app.services.scan_manager import scan_manager
+
+DAEMON_TIMEOUT = 5  # secondes par requête vers le service de reconnaissance
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+class RecognitionUnavailable(RuntimeError):
+    """Le service de reconnaissance (processus séparé) ne répond pas."""
+
+
+class LocalScanBackend:
+    """
+    Scans dans le processus courant (ScanManager), sans service séparé.
+    Utilisé par défaut, et par le service de reconnaissance lui-même.
+    """
+
+    def __init__(self, manager=None):
+        self.manager = manager or scan_manager
+
+    def start(self, cours_session_id, headless=None, app=None, source=None):
+        """
+        Returns:
+            (bool, message d'erreur ou None)
+        """
+        return self.manager.start(cours_session_id, headless, app, source)
+
+    def stop(self, cours_session_id=None):
+        """Nombre de scans arrêtés (tous si cours_session_id est None)."""
+        return self.manager.stop(cours_session_id)
+
+    def status(self, cours_session_id=None):
+        """Statut d'une session (None si inconnue) ou de tous les scans."""
+        status = self.manager.status(cours_session_id)
+        if cours_session_id is None:
+            status.update(RecognitionService.get_models_status())
+        return status
+
+    def events(self, since=0, timeout=0):
+        return scan_events.since(since, timeout)
+
+    def metrics(self):
+        """Histogrammes par étape et compteurs (voir scan_metrics)."""
+        return self.manager.metrics()
+
+    def invalidate_gallery(self, reason=None):
+        """Nouvelle version de la galerie en cache (rechargée au prochain get())."""
+        return gallery_cache.invalidate(reason)
+
+    def stream(self, cours_session_id=None):
+        """Flux MJPEG d'une session (la dernière démarrée si None), None si inconnue."""
+        session = self.manager.get(cours_session_id)
+        return session.broadcaster.stream() if session else None
+
+
+class RemoteScanBackend:
+    """
+    Client HTTP du service de reconnaissance (recognition_daemon), qui possède
+    les modèles et la caméra. Les workers web ne chargent pas la pile ML.
+    """
+
+    def __init__(self, base_url, timeout=DAEMON_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None, timeout=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = Request(f"{self.base_url}{path}", data=data, method=method,
+                          headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=timeout or self.timeout) as response:
+                return response.status, json.loads(response.read() or b"{}")
+        except HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b"{}")
+            except ValueError:
+                return e.code, {"error": str(e)}
+        except (URLError, OSError) as e:
+            raise RecognitionUnavailable(
+                f"Service de reconnaissance injoignable ({self.base_url}): {e}"
+            ) from e
+
+    def start(self, cours_session_id, headless=None, app=None, source=None):
+        status, body = self._request("POST", "/start", {
+            "cours_session_id": cours_session_id,
+            "headless": headless,
+            "source": source
+        })
+        return status == 200, body.get("error")
+
+    def stop(self, cours_session_id=None):
+        return self._request("POST", "/stop", {"cours_session_id": cours_session_id})[1].get("stopped", 0)
+
+    def status(self, cours_session_id=None):
+        query = f"?{urlencode({'cours_session_id': cours_session_id})}" if cours_session_id is not None else ""
+        status, body = self._request("GET", f"/status{query}")
+        return body if status == 200 else None
+
+    def events(self, since=0, timeout=0):
+        query = urlencode({"since": since, "timeout": timeout})
+        return self._request("GET", f"/events?{query}", timeout=self.timeout + timeout)[1]
+
+    def metrics(self):
+        return self._request("GET", "/metrics")[1]
+
+    def invalidate_gallery(self, reason=None):
+        """Invalide la galerie du service (inscription, modification, suppression)."""
+        return self._request("POST", "/invalidate", {"reason": reason})[1].get("version")
+
+    def stream(self, cours_session_id=None):
+        """Relais du flux MJPEG du service (None si session inconnue)."""
+        query = f"?{urlencode({'cours_session_id': cours_session_id})}" if cours_session_id is not None else ""
+        try:
+            response = urlopen(f"{self.base_url}/stream{query}", timeout=self.timeout)
+        except HTTPError as e:
+            if e.code == 404:
+                return None
+            raise RecognitionUnavailable(f"Service de reconnaissance: {e}") from e
+        except (URLError, OSError) as e:
+            raise RecognitionUnavailable(
+                f"Service de reconnaissance injoignable ({self.base_url}): {e}"
+            ) from e
+
+        def relay():
+            with response:
+                while True:
+                    chunk = response.read1(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        return relay()
+
+
+local_scan_backend = LocalScanBackend()
+_remote_backends = {}
+
+
+def get_scan_backend(config):
+    """
+    Service de reconnaissance séparé si RECOGNITION_DAEMON_URL est configuré,
+    sinon scan dans le processus courant.
+    """
+    url = config.get("RECOGNITION_DAEMON_URL")
+    if not url:
+        return local_scan_backend
+    if url not in _remote_backends:
+        _remote_backends[url] = RemoteScanBackend(
+            url, timeout=config.get("RECOGNITION_DAEMON_TIMEOUT", DAEMON_TIMEOUT)
+        )
+    return _remote_backends[url]
+
+
+def invalidate_gallery(reason=None, config=None):
+    """
+    Invalide la galerie de ce processus et, si RECOGNITION_DAEMON_URL est
+    configuré, celle du service de reconnaissance qui exécute les scans.
+
+    Args:
+        config: configuration de l'application ; None = celle du contexte
+            courant, ou Config hors contexte (threads d'arrière-plan)
+    """
+    version = gallery_cache.invalidate(reason)
+    if config is None:
+        from flask import current_app, has_app_context
+        config = current_app.config if has_app_context() else vars(Config)
+
+    backend = get_scan_backend(config)
+    if backend is not local_scan_backend:
+        try:
+            backend.invalidate_gallery(reason)
+        except RecognitionUnavailable as e:
+            print(f"[WARNING] Galerie du service non invalidée: {str(e)}")
+    return version
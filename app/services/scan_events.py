@@ -0,0 +1,49 @@
+# app/services/scan_events.py
+import threading
+from collections import deque
+from datetime import datetime
+
+EVENT_LOG_SIZE = 1000  # évènements gardés en mémoire
+
+
+class ScanEventLog:
+    """
+    Journal des évènements du scan (début, présence enregistrée, fin).
+
+    Chaque évènement a un numéro croissant : un client demande les évènements
+    après le dernier numéro reçu (attente bornée si aucun nouvel évènement).
+    """
+
+    def __init__(self, maxlen=EVENT_LOG_SIZE):
+        self._events = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self._seq = 0
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def publish(self, event_type, **data):
+        with self._condition:
+            self._seq += 1
+            event = {"seq": self._seq, "type": event_type,
+                     "time": datetime.now().isoformat(), **data}
+            self._events.append(event)
+            self._condition.notify_all()
+        return event
+
+    def since(self, seq=0, timeout=0):
+        """
+        Évènements de numéro > seq, après au plus timeout secondes d'attente.
+
+        Returns:
+            {"last_seq": int, "events": [...]}
+        """
+        with self._condition:
+            if timeout and self._seq <= seq:
+                self._condition.wait_for(lambda: self._seq > seq, timeout=timeout)
+            events = [event for event in self._events if event["seq"] > seq]
+            return {"last_seq": self._seq, "events": events}
+
+
+scan_events = ScanEventLog()
@@ -0,0 +1,246 @@
+# app/services/scan_manager.py
+import threading
+from datetime import datetime
+
+from app.services.capture_sources import CAMERA_INDEXES, CaptureSpec, describe, open_capture_source, parse_source
+from app.services.scan_events import scan_events
+from app.services.scan_metrics import scan_metrics
+from app.services.scan_stream import FrameBroadcaster
+
+EXCLUSIVE_SOURCES = ("device", "stream")  # sources qu'un seul scan peut lire à la fois
+
+
+class ScanSession:
+    """
+    État isolé d'un scan : source de capture, étudiants détectés,
+    statistiques, aperçu MJPEG et évènement d'arrêt propres à une session.
+    """
+
+    def __init__(self, cours_session_id, headless=False, source=None):
+        self.cours_session_id = cours_session_id
+        self.headless = headless
+        self.source = source  # CaptureSpec, None = première caméra qui répond (fixée à l'ouverture)
+        self.stop_event = threading.Event()
+        self.detected_students = set()
+        self.broadcaster = FrameBroadcaster()
+        self.pipeline = None  # ScanPipeline, créé par run_face_scan
+        self.cap = None  # source ouverte par run_face_scan
+        self.thread = None
+        self.started_at = datetime.now()
+        self.finished_at = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    @property
+    def camera(self):
+        """Index de la caméra locale (None pour les autres sources)."""
+        return self.source.target if self.source and self.source.kind == "device" else None
+
+    def status(self):
+        pipeline = self.pipeline
+        return {
+            "cours_session_id": self.cours_session_id,
+            "running": self.running,
+            "camera": self.camera,
+            "source": describe(self.source),
+            "headless": self.headless,
+            "detected_count": len(self.detected_students),
+            "detected_students": sorted(self.detected_students),
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "stats": pipeline.stats.to_dict() if pipeline else None,
+            "timings": pipeline.timings.to_dict() if pipeline else None,
+            "rates": pipeline.scheduler.snapshot() if pipeline and self.running else None
+        }
+
+    def metrics(self):
+        """Compteurs du scan pour /scan/metrics."""
+        pipeline = self.pipeline
+        counters = {}
+        if pipeline:
+            counters = pipeline.stats.to_dict()
+            counters["faces_recognized"] = counters.pop("total_detections")
+            counters["frames_dropped"] = pipeline.frames_dropped
+        return {
+            "cours_session_id": self.cours_session_id,
+            "running": self.running,
+            "source": describe(self.source),
+            "counters": counters
+        }
+
+
+class ScanManager:
+    """
+    Scans simultanés (une session de cours par salle), chacun dans son thread.
+    Les sessions terminées restent consultables jusqu'à leur redémarrage.
+    """
+
+    def __init__(self, runner=None, max_sessions=None):
+        """
+        Args:
+            runner: fonction (ScanSession, app) -> liste des étudiants détectés
+            max_sessions: nombre max de scans simultanés (None = illimité)
+        """
+        self._runner = runner
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()  # une recherche de caméra libre à la fois
+        self._sessions = {}
+        self._latest = None
+
+    def _run_session(self, session, app):
+        if self._runner is not None:
+            return self._runner(session, app)
+        from app.services.recognition_service import RecognitionService
+        return RecognitionService.run_session(session, app)
+
+    def start(self, cours_session_id, headless=None, app=None, source=None):
+        """
+        Démarre le scan d'une session de cours.
+
+        Args:
+            source: index de caméra, URL, vidéo, dossier d'images ou
+                "synthetic" (voir capture_sources), None = caméra libre
+
+        Returns:
+            (bool, message d'erreur ou None)
+        """
+        try:
+            spec = parse_source(source)
+        except ValueError as e:
+            return False, str(e)
+
+        with self._lock:
+            current = self._sessions.get(cours_session_id)
+            if current is not None and current.running:
+                return False, f"Un scan est déjà en cours pour la session {cours_session_id}"
+
+            running = [s for s in self._sessions.values() if s.running]
+            if self.max_sessions and len(running) >= self.max_sessions:
+                return False, f"Nombre maximal de scans simultanés atteint ({self.max_sessions})"
+
+            used = [s.source for s in running if s.source and s.source.kind in EXCLUSIVE_SOURCES]
+            if spec is None:
+                # La caméra est choisie à l'ouverture (open_source), parmi les index libres
+                if not [index for index in CAMERA_INDEXES if CaptureSpec("device", index, {}) not in used]:
+                    return False, "Aucune caméra libre"
+            elif spec in used:
+                return False, f"La source {describe(spec)} est déjà utilisée par un autre scan"
+
+            session = ScanSession(cours_session_id, headless, spec)
+            session.thread = threading.Thread(
+                target=self._run,
+                args=(session, app),
+                name=f"scan-{cours_session_id}",
+                daemon=True
+            )
+            self._sessions[cours_session_id] = session
+            self._latest = cours_session_id
+            session.thread.start()
+        return True, None
+
+    def open_source(self, session):
+        """
+        Ouvre la source d'une session. Sans source précisée, essaie les caméras
+        locales (CAMERA_INDEXES) non utilisées par les autres scans, et garde
+        sur la session l'index de celle qui a répondu.
+
+        Returns:
+            source ouverte, ou None
+        """
+        if session.source is not None:
+            return open_capture_source(session.source)
+
+        with self._probe_lock:
+            with self._lock:
+                exclude = [s.camera for s in self._sessions.values()
+                           if s is not session and s.running and s.camera is not None]
+            cap = open_capture_source(None, exclude=exclude)
+            if cap is not None:
+                session.source = CaptureSpec("device", cap.index, {})
+        return cap
+
+    def _run(self, session, app):
+        scan_metrics.inc("scans_started")
+        scan_events.publish("scan_started", cours_session_id=session.cours_session_id,
+                            camera=session.camera, source=describe(session.source))
+        try:
+            detected = self._run_session(session, app)
+        except Exception as e:
+            print(f"[ERROR] Scan de la session {session.cours_session_id} interrompu: {str(e)}")
+            detected = session.detected_students
+        finally:
+            session.finished_at = datetime.now()
+            session.broadcaster.close()
+            scan_metrics.inc("scans_finished")
+        scan_events.publish("scan_finished", cours_session_id=session.cours_session_id,
+                            detected_students=sorted(detected or []))
+
+    def get(self, cours_session_id=None):
+        """Session demandée, ou la dernière démarrée si None."""
+        with self._lock:
+            key = cours_session_id if cours_session_id is not None else self._latest
+            return self._sessions.get(key)
+
+    def stop(self, cours_session_id=None):
+        """
+        Arrête un scan (tous les scans si cours_session_id est None).
+
+        Returns:
+            nombre de scans arrêtés
+        """
+        with self._lock:
+            if cours_session_id is None:
+                sessions = list(self._sessions.values())
+            else:
+                sessions = [self._sessions[cours_session_id]] if cours_session_id in self._sessions else []
+
+        stopped = 0
+        for session in sessions:
+            if session.running:
+                session.stop()
+                stopped += 1
+        return stopped
+
+    def metrics(self):
+        """Métriques globales + compteurs de chaque session."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return scan_metrics.snapshot([session.metrics() for session in sessions])
+
+    def running_sessions(self):
+        with self._lock:
+            return [s for s in self._sessions.values() if s.running]
+
+    def status(self, cours_session_id=None):
+        """
+        Statut d'une session, ou vue d'ensemble si cours_session_id est None
+        (champs de la dernière session pour compatibilité + liste des sessions).
+        """
+        if cours_session_id is not None:
+            session = self.get(cours_session_id)
+            return session.status() if session else None
+
+        with self._lock:
+            sessions = [s.status() for s in self._sessions.values()]
+        latest = self.get()
+        latest_status = latest.status() if latest else {}
+        return {
+            "running": any(s["running"] for s in sessions),
+            "cours_session_id": latest_status.get("cours_session_id"),
+            "detected_count": latest_status.get("detected_count", 0),
+            "detected_students": latest_status.get("detected_students", []),
+            "rates": latest_status.get("rates"),
+            "sessions": sessions
+        }
+
+
+scan_manager = ScanManager()
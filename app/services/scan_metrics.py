@@ -0,0 +1,128 @@
+# app/services/scan_metrics.py
+"""
+Métriques des scans pour /scan/metrics (JSON ou format texte Prometheus).
+
+    - histogrammes de durée par étape : capture, detect, embed, match,
+      end_to_end, persist, render (tous les scans du processus)
+    - compteurs globaux : scans démarrés / terminés, présences enregistrées
+    - compteurs par scan (ScanSession.metrics) : frames, visages vus,
+      reconnus, inconnus, frames abandonnées
+
+Une mesure = une recherche de bucket + un verrou : négligeable devant une
+détection de visage.
+"""
+import bisect
+import threading
+
+# Bornes des buckets en secondes (dernier bucket implicite : +Inf)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STAGES = ("capture", "detect", "embed", "match", "end_to_end", "persist", "render")
+# Compteurs par scan exportés (clés de ScanStats + frames abandonnées)
+SESSION_COUNTERS = ("frames_captured", "frames_analyzed", "frames_dropped", "faces_seen",
+                    "faces_embedded", "faces_recognized", "faces_unknown", "unique_detections")
+PROMETHEUS_PREFIX = "scan"
+
+
+class Histogram:
+    """Histogramme cumulatif à buckets fixes (compatible Prometheus)."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def to_dict(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "count": running,
+            "sum": round(total, 6),
+            "buckets": {str(bound): cumulative[i] for i, bound in enumerate(self.buckets)}
+        }
+
+
+class ScanMetrics:
+    """Histogrammes par étape et compteurs globaux, partagés par tous les scans."""
+
+    def __init__(self, stages=STAGES):
+        self._lock = threading.Lock()
+        self._histograms = {stage: Histogram() for stage in stages}
+        self._counters = {}
+
+    def observe(self, stage, seconds):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self, sessions=()):
+        """
+        Args:
+            sessions: métriques par scan (ScanSession.metrics())
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        return {
+            "stages": {stage: histogram.to_dict() for stage, histogram in histograms.items()},
+            "counters": counters,
+            "sessions": list(sessions)
+        }
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def to_prometheus(snapshot):
+    """Format texte d'exposition Prometheus d'un snapshot (éventuellement distant)."""
+    lines = []
+    name = f"{PROMETHEUS_PREFIX}_stage_duration_seconds"
+    lines.append(f"# HELP {name} Durée des étapes du scan")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, histogram in snapshot["stages"].items():
+        for bound, count in histogram["buckets"].items():
+            lines.append(f"{name}_bucket{_labels(stage=stage, le=bound)} {count}")
+        lines.append(f"{name}_bucket{_labels(stage=stage, le='+Inf')} {histogram['count']}")
+        lines.append(f"{name}_sum{_labels(stage=stage)} {histogram['sum']}")
+        lines.append(f"{name}_count{_labels(stage=stage)} {histogram['count']}")
+
+    for counter, value in sorted(snapshot["counters"].items()):
+        name = f"{PROMETHEUS_PREFIX}_{counter}_total"
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+
+    sessions = snapshot["sessions"]
+    name = f"{PROMETHEUS_PREFIX}_running"
+    lines.append(f"# HELP {name} Scans en cours")
+    lines.append(f"# TYPE {name} gauge")
+    lines.append(f"{name} {sum(1 for s in sessions if s['running'])}")
+
+    for counter in SESSION_COUNTERS:
+        name = f"{PROMETHEUS_PREFIX}_session_{counter}_total"
+        lines.append(f"# TYPE {name} counter")
+        for session in sessions:
+            labels = _labels(cours_session_id=session["cours_session_id"])
+            lines.append(f"{name}{labels} {session['counters'].get(counter, 0)}")
+    return "\n".join(lines) + "\n"
+
+
+scan_metrics = ScanMetrics()
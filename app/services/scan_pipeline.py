@@ -0,0 +1,419 @@
+# app/services/scan_pipeline.py
+"""
+Pipeline de scan en plusieurs étapes, chacune dans son propre thread :
+
+    capture -> détection/embedding -> reconnaissance -> enregistrement
+                                                     -> affichage (thread appelant)
+
+Les étapes sont reliées par des files bornées qui ne gardent que la frame la
+plus récente : l'inférence travaille toujours sur l'image la plus fraîche et
+une base de données lente ne bloque jamais la capture.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from app.services.face_tracker import FaceTracker
+from app.services.scan_metrics import scan_metrics
+
+# Le nombre de frames à afficher / analyser en attente est volontairement très petit
+DISPLAY_QUEUE_SIZE = 1
+DETECT_QUEUE_SIZE = 1
+MATCH_QUEUE_SIZE = 2
+QUEUE_TIMEOUT = 0.2  # secondes
+TIMING_SAMPLES = 2048  # durées gardées par étape pour les percentiles
+
+
+class LatestQueue:
+    """
+    File bornée "garder le plus récent" : quand elle est pleine, l'élément
+    le plus ancien est jeté au profit du nouveau.
+    """
+
+    def __init__(self, maxsize=1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, item):
+        """Ajoute un élément ; retourne True si un ancien élément a été jeté."""
+        with self._lock:
+            dropped = False
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return dropped
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                        dropped = True
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """Retourne l'élément suivant, ou None après timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def __len__(self):
+        return self._queue.qsize()
+
+
+class ScanStats:
+    """Compteurs d'un scan (chaque compteur n'a qu'un seul thread écrivain)."""
+
+    def __init__(self):
+        self.frames_captured = 0
+        self.frames_analyzed = 0
+        self.faces_seen = 0
+        self.faces_embedded = 0
+        self.faces_unknown = 0
+        self.total_detections = 0  # visages reconnus (toutes frames analysées)
+        self.unique_detections = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class StageTimings:
+    """
+    Durées des étapes d'un scan (les TIMING_SAMPLES dernières par étape) :
+    detect, embed, match et end_to_end (capture -> reconnaissance).
+    """
+
+    def __init__(self, maxlen=TIMING_SAMPLES):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self.maxlen)).append(seconds)
+
+    def to_dict(self):
+        """Par étape : nombre de mesures, moyenne et percentiles en ms."""
+        with self._lock:
+            samples = {stage: np.asarray(values) * 1000.0 for stage, values in self._samples.items()}
+        result = {}
+        for stage, values in samples.items():
+            p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+            result[stage] = {
+                "count": int(values.size),
+                "mean_ms": round(float(values.mean()), 2),
+                "p50_ms": round(float(p50), 2),
+                "p90_ms": round(float(p90), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(values.max()), 2)
+            }
+        return result
+
+
+class ScanPipeline:
+    """
+    Étapes capture / détection-embedding / reconnaissance / enregistrement
+    d'un scan. L'affichage reste dans le thread appelant (obligatoire pour
+    cv2.imshow) qui lit display_queue et faces_info.
+    """
+
+    def __init__(self, cap, face_pipeline, gallery, presence_writer,
+                 threshold, scheduler, detected_students, tracker=None,
+                 filiere=None, roster_loader=None, full_gallery_fallback=True,
+                 metrics=None):
+        """
+        Args:
+            cap: source vidéo (méthode read(), attribut finished optionnel
+                pour une vidéo ou un dossier d'images qui se termine)
+            face_pipeline: FacePipeline (detect(frame), embed_batch(faces))
+            gallery: cache de galerie (version, get())
+            presence_writer: PresenceWriter (écriture groupée et asynchrone)
+            threshold: seuil de distance cosinus
+            scheduler: AdaptiveFrameScheduler (quelles frames analyser)
+            detected_students: set partagé des étudiants enregistrés
+            tracker: FaceTracker (suivi des visages entre keyframes)
+            filiere: filière du cours ; si fournie avec roster_loader, seuls les
+                étudiants de la filière sont candidats
+            roster_loader: fonction () -> ids des étudiants de la filière
+            full_gallery_fallback: recherche dans toute la galerie pour les
+                visages qui ne correspondent à aucun candidat
+            metrics: ScanMetrics (histogrammes de /scan/metrics), scan_metrics par défaut
+        """
+        self.cap = cap
+        self.face_pipeline = face_pipeline
+        self.gallery = gallery
+        self.presence_writer = presence_writer
+        presence_writer.on_recorded = self._on_presence_recorded
+        presence_writer.on_failed = self._on_presence_failed
+        presence_writer.on_flushed = lambda count, seconds: self.record_timing("persist", seconds)
+        self.threshold = threshold
+        self.scheduler = scheduler
+        self.detected_students = detected_students
+        # Le tracker est mis à jour par l'étape détection ; l'identité des
+        # pistes par l'étape reconnaissance (au pire un embedding de trop)
+        self.tracker = tracker or FaceTracker()
+        self.filiere = filiere
+        self.roster_loader = roster_loader
+        self.full_gallery_fallback = full_gallery_fallback
+
+        self.display_queue = LatestQueue(DISPLAY_QUEUE_SIZE)
+        self.detect_queue = LatestQueue(DETECT_QUEUE_SIZE)
+        self.match_queue = LatestQueue(MATCH_QUEUE_SIZE)
+
+        self.stats = ScanStats()
+        self.timings = StageTimings()
+        self.first_frame_at = None  # première frame lue (hors chargement des modèles et ouverture caméra)
+        self.metrics = metrics or scan_metrics
+        self.faces_info = []  # dernier résultat publié (remplacé en bloc)
+        self._load_gallery()
+
+        self.source_finished = False  # fin d'une vidéo / d'un dossier d'images
+        self._last_submitted = 0  # dernière frame envoyée à la détection
+        self._last_done = 0  # dernière frame entièrement traitée
+
+        self._pending = set()  # étudiants en attente d'enregistrement
+        self.on_presence = None  # appelé avec (etudiant_id, distance) après enregistrement
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    @property
+    def gallery_size(self):
+        return len(self.matcher)
+
+    @property
+    def active_size(self):
+        """Candidats encore recherchés (pas encore enregistrés)."""
+        return len(self.active_matcher)
+
+    def _load_gallery(self):
+        """Galerie complète + sous-galerie des candidats de la session (en cache)."""
+        self.gallery_version, self.full_matcher = self.gallery.get()
+        if self.filiere and self.roster_loader:
+            self.gallery_version, self.matcher = self.gallery.get_candidates(
+                ("filiere", self.filiere), self.roster_loader
+            )
+        else:
+            self.matcher = self.full_matcher
+        self._refresh_active()
+
+    def _refresh_active(self):
+        """
+        Sépare les candidats en deux galeries : les étudiants pas encore
+        enregistrés (recherche principale) et ceux déjà enregistrés (seulement
+        pour étiqueter leur visage). La recherche principale rétrécit au fil
+        de la séance.
+        """
+        recorded = set(self.detected_students)
+        self._recorded_count = len(recorded)
+        if recorded:
+            self.active_matcher = self.matcher.exclude(recorded)
+            self.recorded_matcher = self.full_matcher.subset(recorded)
+        else:
+            self.active_matcher = self.matcher
+            self.recorded_matcher = None
+
+    @property
+    def frames_dropped(self):
+        return self.display_queue.dropped + self.detect_queue.dropped + self.match_queue.dropped
+
+    def start(self):
+        stages = [
+            ("capture", self._capture_stage),
+            ("detect", self._detect_stage),
+            ("match", self._match_stage),
+        ]
+        self.presence_writer.start()
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f"scan-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def record_timing(self, stage, seconds):
+        """Durée d'une étape : percentiles du scan + histogramme de /scan/metrics."""
+        self.timings.record(stage, seconds)
+        self.metrics.observe(stage, seconds)
+
+    def drained(self):
+        """True quand la source est terminée et sa dernière frame analysée."""
+        return self.source_finished and self._last_done >= self._last_submitted
+
+    def join(self, timeout=5.0):
+        for thread in self._threads:
+            thread.join(timeout)
+        # Les présences en attente sont écrites avant la fin du scan
+        self.presence_writer.stop()
+
+    # -----------------------
+    # Étapes
+    # -----------------------
+    def _capture_stage(self):
+        while not self.stopped():
+            started = time.perf_counter()
+            try:
+                ret, frame = self.cap.read()
+            except Exception as e:
+                print(f"[WARNING] Erreur de capture: {e}")
+                ret, frame = False, None
+
+            if not ret:
+                if getattr(self.cap, "finished", False):
+                    print("[INFO] Fin de la source de capture")
+                    self.source_finished = True
+                    return
+                print("[WARNING] Impossible de lire la frame, tentative de récupération...")
+                time.sleep(0.1)
+                continue
+
+            self.record_timing("capture", time.perf_counter() - started)
+            if self.first_frame_at is None:
+                self.first_frame_at = datetime.now()
+            self.stats.frames_captured += 1
+            frame_id = self.stats.frames_captured
+            self.scheduler.record_capture()
+
+            if self.scheduler.should_analyze(frame_id):
+                # Copie : l'affichage dessine directement sur la frame
+                self.detect_queue.put((frame_id, time.perf_counter(), frame.copy()))
+                self._last_submitted = frame_id
+            self.display_queue.put((frame_id, frame))
+
+    def _detect_stage(self):
+        while not self.stopped():
+            item = self.detect_queue.get(timeout=QUEUE_TIMEOUT)
+            if item is None:
+                continue
+
+            frame_id, captured_at, frame = item
+            started = time.perf_counter()
+            try:
+                faces = self.face_pipeline.detect(frame)
+                tracks = self.tracker.update(faces)
+                detected = time.perf_counter()
+
+                # Seules les pistes nouvelles ou non confirmées passent par le modèle
+                to_embed = [i for i, track in enumerate(tracks) if not track.confirmed]
+                embeddings = self.face_pipeline.embed_batch([faces[i].face for i in to_embed])
+            except Exception as e:
+                print(f"[WARNING] Erreur extraction visages: {e}")
+                self._last_done = frame_id
+                continue
+
+            finished = time.perf_counter()
+            self.record_timing("detect", detected - started)
+            if to_embed:
+                self.record_timing("embed", finished - detected)
+            self.scheduler.record_recognition(finished - started)
+            self.stats.frames_analyzed += 1
+            self.stats.faces_seen += len(tracks)
+            self.stats.faces_embedded += len(to_embed)
+            self.match_queue.put((frame_id, captured_at, tracks, [tracks[i] for i in to_embed], embeddings))
+
+    def _match_stage(self):
+        while not self.stopped():
+            item = self.match_queue.get(timeout=QUEUE_TIMEOUT)
+            if item is None:
+                continue
+
+            # Nouvelle inscription / modification / suppression : on remplace
+            # la galerie entre deux frames, sans redémarrer la caméra
+            if self.gallery.version != self.gallery_version:
+                self._load_gallery()
+                print(f"[INFO] Galerie rechargée : {len(self.matcher)} candidats "
+                      f"(version {self.gallery_version})")
+            elif len(self.detected_students) != self._recorded_count:
+                self._refresh_active()
+
+            frame_id, captured_at, tracks, embedded_tracks, embeddings = item
+            if embedded_tracks:
+                started = time.perf_counter()
+                matches = self._match(embeddings)
+                self.record_timing("match", time.perf_counter() - started)
+                for track, (match_id, min_dist) in zip(embedded_tracks, matches):
+                    track.update_identity(match_id, min_dist)
+
+            faces_info = []
+            for track in tracks:
+                match_id, min_dist = track.student_id, track.distance
+                if match_id is not None:
+                    self.stats.total_detections += 1
+                    if match_id not in self.detected_students and match_id not in self._pending:
+                        # Enregistrement asynchrone : la reconnaissance n'attend pas MySQL
+                        print(f"[DEBUG] Match trouvé: ID {match_id} avec distance {min_dist:.3f}")
+                        self._pending.add(match_id)
+                        self.presence_writer.submit(match_id, min_dist)
+                else:
+                    self.stats.faces_unknown += 1
+
+                x, y, w, h = track.box
+                faces_info.append((x, y, w, h, match_id, min_dist,
+                                   match_id is not None, track.landmarks))
+
+            self.faces_info = faces_info
+            self._last_done = frame_id
+            self.record_timing("end_to_end", time.perf_counter() - captured_at)
+
+    def _match(self, embeddings):
+        """
+        Recherche dans les candidats pas encore enregistrés et parmi les
+        étudiants déjà enregistrés (étiquette seulement) : le plus proche des
+        deux l'emporte. Puis dans toute la galerie pour les inconnus.
+        """
+        matches = self.active_matcher.match(embeddings, self.threshold)
+
+        if self.recorded_matcher is not None and len(self.recorded_matcher):
+            # Un étudiant enregistré plus proche ne doit pas être attribué à un camarade
+            recorded = self.recorded_matcher.match(embeddings, self.threshold)
+            matches = [
+                recorded_match if recorded_match[0] is not None and recorded_match[1] < active_match[1]
+                else active_match
+                for active_match, recorded_match in zip(matches, recorded)
+            ]
+
+        if self.full_gallery_fallback and self.matcher is not self.full_matcher:
+            for student_id in self._match_unknown(matches, embeddings, self.full_matcher):
+                print(f"[INFO] Étudiant {student_id} hors filière reconnu (galerie complète)")
+
+        return matches
+
+    def _match_unknown(self, matches, embeddings, matcher):
+        """Complète matches (en place) pour les visages encore inconnus."""
+        unknown = [i for i, (match_id, _) in enumerate(matches) if match_id is None]
+        if not unknown or len(matcher) == 0:
+            return []
+
+        found = []
+        for i, result in zip(unknown, matcher.match(embeddings[unknown], self.threshold)):
+            if result[0] is not None:
+                matches[i] = result
+                found.append(result[0])
+        return found
+
+    # -----------------------
+    # Retours du PresenceWriter
+    # -----------------------
+    def _on_presence_recorded(self, match_id, min_dist):
+        self.detected_students.add(match_id)
+        self.stats.unique_detections += 1
+        self._pending.discard(match_id)
+        self.metrics.inc("presences_recorded")
+        print(f" Étudiant {match_id} reconnu et enregistré (distance: {min_dist:.3f})")
+        if self.on_presence:
+            self.on_presence(match_id, min_dist)
+
+    def _on_presence_failed(self, match_id):
+        # Nouvel essai à la prochaine reconnaissance
+        print(f" Échec enregistrement pour étudiant {match_id}")
+        self._pending.discard(match_id)
+        self.metrics.inc("presence_failures")
@@ -0,0 +1,102 @@
+# app/services/scan_run_service.py
+import socket
+from datetime import datetime
+
+from app.models.scan_run import SCAN_RUN_STAGES
+from app.repositories.scan_run_repository import ScanRunRepository
+from app.services.capture_sources import describe
+
+SLOW_END_TO_END_MS = 1000  # p95 capture -> reconnaissance au-delà duquel un scan est signalé lent
+
+
+class ScanRunService:
+
+    @staticmethod
+    def build_report(session, pipeline, finished_at=None):
+        """
+        Champs du rapport d'un scan terminé (ScanSession + ScanPipeline).
+
+        Le scan commence à la première frame lue : le chargement des modèles
+        et l'ouverture de la caméra ne comptent pas dans capture_fps. La
+        source est enregistrée sans identifiants (describe).
+        """
+        finished_at = finished_at or datetime.now()
+        started_at = getattr(pipeline, "first_frame_at", None) or session.started_at
+        stats = pipeline.stats
+        timings = pipeline.timings.to_dict()
+        duration = (finished_at - started_at).total_seconds()
+
+        report = {
+            "cours_session_id": session.cours_session_id,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "source": str(describe(session.source))[:255] if session.source else None,
+            "host": socket.gethostname()[:100],
+            "frames_captured": stats.frames_captured,
+            "frames_analyzed": stats.frames_analyzed,
+            "frames_dropped": pipeline.frames_dropped,
+            "capture_fps": round(stats.frames_captured / duration, 2) if duration > 0 else None,
+            "faces_seen": stats.faces_seen,
+            "faces_per_frame": round(stats.faces_seen / stats.frames_analyzed, 2) if stats.frames_analyzed else None,
+            "faces_recognized": stats.total_detections,
+            "faces_unknown": stats.faces_unknown,
+            "students_recorded": len(session.detected_students)
+        }
+        for stage in SCAN_RUN_STAGES:
+            stage_timings = timings.get(stage, {})
+            report[f"{stage}_mean_ms"] = stage_timings.get("mean_ms")
+            report[f"{stage}_p95_ms"] = stage_timings.get("p95_ms")
+        return report
+
+    @staticmethod
+    def record(session, pipeline):
+        """Enregistre le rapport du scan ; une erreur n'interrompt jamais la fin du scan."""
+        try:
+            run = ScanRunRepository.create(**ScanRunService.build_report(session, pipeline))
+            print(f"[INFO] Rapport de scan enregistré (scan_run {run.id})")
+            return run
+        except Exception as e:
+            print(f"[WARNING] Rapport de scan non enregistré: {str(e)}")
+            return None
+
+    @staticmethod
+    def get_performance_data(filiere=None, date_debut=None, date_fin=None):
+        """
+        Rapports de scan pour le graphique du responsable de filière, et
+        moyennes par machine / source pour repérer les salles trop lentes.
+        """
+        runs = [run.to_dict() for run in ScanRunRepository.get_runs(filiere, date_debut, date_fin)]
+
+        groups = {}
+        for run in runs:
+            groups.setdefault((run["host"], run["source"]), []).append(run)
+
+        def mean(values):
+            values = [v for v in values if v is not None]
+            return round(sum(values) / len(values), 2) if values else None
+
+        by_machine = []
+        for (host, source), group in sorted(groups.items(), key=lambda item: str(item[0])):
+            end_to_end_p95 = mean(r["latencies"]["end_to_end"]["p95_ms"] for r in group)
+            by_machine.append({
+                "host": host,
+                "source": source,
+                "runs": len(group),
+                "capture_fps": mean(r["capture_fps"] for r in group),
+                "faces_per_frame": mean(r["faces_per_frame"] for r in group),
+                "detect_p95_ms": mean(r["latencies"]["detect"]["p95_ms"] for r in group),
+                "end_to_end_p95_ms": end_to_end_p95,
+                "slow": end_to_end_p95 is not None and end_to_end_p95 > SLOW_END_TO_END_MS
+            })
+
+        return {
+            "runs": runs,
+            "by_machine": by_machine,
+            "chart": {
+                "labels": [run["started_at"][:16].replace("T", " ") for run in runs],
+                "capture_fps": [run["capture_fps"] for run in runs],
+                "detect_p95_ms": [run["latencies"]["detect"]["p95_ms"] for run in runs],
+                "end_to_end_p95_ms": [run["latencies"]["end_to_end"]["p95_ms"] for run in runs]
+            },
+            "slow_threshold_ms": SLOW_END_TO_END_MS
+        }
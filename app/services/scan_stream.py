@@ -0,0 +1,110 @@
+# app/services/scan_stream.py
+import threading
+import time
+
+STREAM_FPS = 10  # images envoyées par seconde au navigateur
+JPEG_QUALITY = 70
+BOUNDARY = "frame"
+START_TIMEOUT = 30  # secondes d'attente du démarrage du scan (caméra, modèles)
+
+
+class FrameBroadcaster:
+    """
+    Diffusion MJPEG des frames annotées d'un scan (/scan/<id>/stream), une par session.
+
+    L'encodage JPEG n'a lieu que si au moins un client est connecté, et au
+    plus fps fois par seconde ; le scan peut ainsi tourner sans écran.
+    """
+
+    def __init__(self, fps=STREAM_FPS, quality=JPEG_QUALITY):
+        self.fps = fps
+        self.quality = quality
+        self._condition = threading.Condition()
+        self._clients = 0
+        self._active = False
+        self._jpeg = None
+        self._sequence = 0
+        self._last_publish = 0.0
+
+    @property
+    def has_clients(self):
+        return self._clients > 0
+
+    @property
+    def active(self):
+        return self._active
+
+    def open(self, fps=None, quality=None):
+        """Début d'un scan : les clients peuvent recevoir des frames."""
+        with self._condition:
+            self.fps = fps or self.fps
+            self.quality = quality or self.quality
+            self._active = True
+            self._jpeg = None
+            self._condition.notify_all()
+
+    def close(self):
+        """Fin du scan : les flux en cours se terminent."""
+        with self._condition:
+            self._active = False
+            self._condition.notify_all()
+
+    def wants_frame(self, now=None):
+        """True si une frame doit être encodée maintenant (client connecté + cadence)."""
+        if not self._active or not self.has_clients:
+            return False
+        now = now if now is not None else time.monotonic()
+        return now - self._last_publish >= 1.0 / self.fps
+
+    def publish(self, frame):
+        """Encode et publie une frame annotée (ignoré sans client connecté)."""
+        if not self.wants_frame():
+            return False
+
+        import cv2  # chargé au premier encodage (scan en cours)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)])
+        if not ok:
+            return False
+
+        with self._condition:
+            self._jpeg = buffer.tobytes()
+            self._sequence += 1
+            self._last_publish = time.monotonic()
+            self._condition.notify_all()
+        return True
+
+    def stream(self):
+        """
+        Générateur multipart/x-mixed-replace pour une réponse Flask.
+        Attend le début du scan (START_TIMEOUT s max) et se termine à sa fin.
+        """
+        with self._condition:
+            self._clients += 1
+        try:
+            sequence = -1
+            seen_active = False
+            deadline = time.monotonic() + START_TIMEOUT
+            while True:
+                with self._condition:
+                    if not self._active:
+                        # Scan terminé, ou jamais démarré après START_TIMEOUT
+                        if seen_active or time.monotonic() > deadline:
+                            return
+                        self._condition.wait(timeout=1.0)
+                        continue
+
+                    seen_active = True
+                    if self._sequence == sequence or self._jpeg is None:
+                        self._condition.wait(timeout=1.0)
+                        continue
+                    sequence = self._sequence
+                    jpeg = self._jpeg
+
+                yield (
+                    f"--{BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n"
+                ).encode() + jpeg + b"\r\n"
+        finally:
+            with self._condition:
+                self._clients -= 1
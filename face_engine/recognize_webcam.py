@@ -1,33 +1,26 @@
 import cv2
-import json
 import os
+import sys
 import numpy as np
 from deepface import DeepFace
-from numpy.linalg import norm
 import time
 
+# Accès au package app (galerie compilée partagée avec le scan Flask)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from app.services.gallery_store import load_or_compile_gallery
+from app.services.frame_scheduler import AdaptiveFrameScheduler
+
 DATASET_PATH = "../dataset"
 MODEL_NAME = "ArcFace"  # ou "Facenet512"
 DETECTOR_BACKEND = "yolov8"
 THRESHOLD = 0.45
-FRAME_SKIP = 5  # nombre de frames avant recalcul embedding
-
-# --- Distance cosinus ---
-def cosine_distance(a, b):
-    return 1 - np.dot(a, b) / (norm(a) * norm(b))
+FRAME_SKIP = 5  # nombre de frames avant recalcul embedding (valeur de départ, adaptée ensuite)
+TARGET_DISPLAY_FPS = 15
+TARGET_RECOGNITION_FPS = 3
 
-# --- Chargement embeddings ---
+# --- Chargement embeddings (galerie compilée, un seul fichier mmap) ---
 def load_embeddings():
-    embeddings_db = {}
-    for student_id in os.listdir(DATASET_PATH):
-        student_folder = os.path.join(DATASET_PATH, student_id)
-        embedding_file = os.path.join(student_folder, "embeddings.json")
-        if not os.path.isfile(embedding_file):
-            continue
-        with open(embedding_file, "r") as f:
-            data = json.load(f)
-        embeddings_db[student_id] = np.array(data["embedding"])
-    return embeddings_db
+    return load_or_compile_gallery(DATASET_PATH, MODEL_NAME)
 
 # --- Webcam ---
 cap = cv2.VideoCapture(0)
@@ -35,9 +28,10 @@ if not cap.isOpened():
     print(" Webcam non accessible")
     exit()
 
-embeddings_db = load_embeddings()
-print(f"[INFO] {len(embeddings_db)} étudiants chargés")
+gallery = load_embeddings()
+print(f"[INFO] {len(gallery)} étudiants chargés")
 
+scheduler = AdaptiveFrameScheduler(TARGET_DISPLAY_FPS, TARGET_RECOGNITION_FPS, initial_skip=FRAME_SKIP)
 frame_count = 0
 faces_info = []  # liste (bbox, name, distance)
 prev_time = time.time()
@@ -47,9 +41,11 @@ while True:
     if not ret:
         break
     frame_count += 1
+    scheduler.record_capture()
 
-    # --- Détection et embedding toutes les FRAME_SKIP frames ---
-    if frame_count % FRAME_SKIP == 0:
+    # --- Détection et embedding toutes les frame_skip frames (adapté à la machine) ---
+    if scheduler.should_analyze(frame_count):
+        recognition_start = time.perf_counter()
         faces_info = []
         results = DeepFace.extract_faces(frame, detector_backend=DETECTOR_BACKEND, enforce_detection=False)
         for face in results:
@@ -62,17 +58,13 @@ while True:
                 continue
 
             # Reconnaissance
-            min_dist = float("inf")
-            match_name = "INCONNU"
-            for student_id, stored_emb in embeddings_db.items():
-                dist = cosine_distance(emb, stored_emb)
-                if dist < min_dist:
-                    min_dist = dist
-                    if dist < THRESHOLD:
-                        match_name = student_id
+            student_id, min_dist = gallery.match(np.array([emb]), THRESHOLD)[0]
+            match_name = f"etudiant_{student_id}" if student_id is not None else "INCONNU"
 
             faces_info.append((x, y, w, h, match_name, min_dist))
 
+        scheduler.record_recognition(time.perf_counter() - recognition_start)
+
     # --- Affichage ---
     for x, y, w, h, name, dist in faces_info:
         color = (0, 255, 0) if name != "INCONNU" else (0, 0, 255)
@@ -84,7 +76,9 @@ while True:
     curr_time = time.time()
     fps = 1.0 / (curr_time - prev_time)
     prev_time = curr_time
-    cv2.putText(frame, f"FPS: {int(fps)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    scheduler.record_display()
+    cv2.putText(frame, f"FPS: {int(fps)}  SKIP: {scheduler.frame_skip}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
     cv2.imshow("Reconnaissance Faciale - ArcFace + YOLO", frame)
     if cv2.waitKey(1) & 0xFF == ord("q"):
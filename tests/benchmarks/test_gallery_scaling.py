@@ -0,0 +1,207 @@
+# tests/benchmarks/test_gallery_scaling.py
+"""
+Passage à l'échelle de la galerie avec des embeddings synthétiques (512-d,
+du même ordre de grandeur que ceux d'ArcFace) : aucun modèle ni poids DeepFace.
+
+Pour chaque taille de galerie :
+    - chargement : load_embeddings (un embeddings.json par étudiant) contre
+      la galerie compilée de gallery_store (mmap)
+    - reconnaissance : 1 visage et un batch de visages (GalleryMatcher.match)
+    - mémoire : taille de la matrice, pic d'allocation Python (tracemalloc)
+
+    python tests/benchmarks/test_gallery_scaling.py --sizes 500,5000,50000,500000
+    python -m pytest -q tests/benchmarks/test_gallery_scaling.py
+
+Le tableau est affiché et écrit en JSON (--output). Les fichiers JSON par
+étudiant ne sont générés que jusqu'à --json-max étudiants (disque et temps).
+Compter environ 1 Go de mémoire pour 500 000 étudiants.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+SIZES = (500, 5000, 50000, 500000)
+TEST_SIZES = os.environ.get("SCAN_BENCH_GALLERY_SIZES", "500")
+JSON_MAX = 50000  # au-delà, load_embeddings n'est pas mesuré
+DIM = 512
+BATCH_SIZE = 32  # visages par frame dans le cas "batch"
+EMBEDDING_SCALE = 1.1  # norme ~25, comme les embeddings ArcFace non normalisés
+NOISE = 0.3  # écart entre le visage capté et l'embedding d'inscription
+MATCH_BUDGET_S = 0.5  # durée de mesure de chaque cas de reconnaissance
+THRESHOLD = 0.4
+OUTPUT_FILE = "gallery_scaling.json"
+
+
+def make_embeddings(count, seed=0):
+    """Embeddings d'inscription synthétiques, shape (count, DIM), float32."""
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, DIM), dtype=np.float32) * EMBEDDING_SCALE
+
+
+def make_queries(embeddings, count, seed=1):
+    """Visages captés : embeddings d'étudiants au hasard + bruit. Retourne (indices, visages)."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(embeddings), size=count)
+    noise = rng.standard_normal((count, DIM), dtype=np.float32) * EMBEDDING_SCALE * NOISE
+    return rows, embeddings[rows] + noise
+
+
+def write_json_dataset(dataset_dir, ids, embeddings):
+    """Un dossier etudiant_<id>/embeddings.json par étudiant (format historique)."""
+    for student_id, embedding in zip(ids, embeddings):
+        folder = os.path.join(dataset_dir, f"etudiant_{student_id}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "embeddings.json"), "w") as f:
+            json.dump({"embedding": embedding.tolist()}, f)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def heap_peak_mb(fn):
+    """Pic d'allocation Python (numpy compris) pendant fn, en Mo."""
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def median_ms(fn, budget=MATCH_BUDGET_S, min_runs=3):
+    """Médiane des durées de fn, répétée pendant budget secondes."""
+    durations = []
+    deadline = time.perf_counter() + budget
+    while len(durations) < min_runs or time.perf_counter() < deadline:
+        durations.append(timed(fn)[1])
+    return round(statistics.median(durations) * 1000.0, 3)
+
+
+def load_legacy(dataset_dir):
+    """load_embeddings (sortie console coupée) puis construction du GalleryMatcher."""
+    from app.services import facial_recognition
+    from app.services.gallery_matcher import GalleryMatcher
+
+    original_path = facial_recognition.DATASET_PATH
+    facial_recognition.DATASET_PATH = dataset_dir
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            embeddings_db = facial_recognition.load_embeddings()
+    finally:
+        facial_recognition.DATASET_PATH = original_path
+    return GalleryMatcher.from_embeddings(embeddings_db)
+
+
+def bench_size(count, workdir, json_max=JSON_MAX):
+    """Mesures pour une galerie de count étudiants."""
+    from app.services import gallery_store
+
+    ids = np.arange(1, count + 1)
+    embeddings = make_embeddings(count)
+    rows, queries = make_queries(embeddings, BATCH_SIZE)
+    dataset_dir = os.path.join(workdir, f"dataset_{count}")
+    os.makedirs(dataset_dir)
+
+    result = {"identities": count, "matrix_mb": round(count * DIM * 4 / 1e6, 1)}
+
+    # Format historique : un fichier JSON par étudiant
+    if count <= json_max:
+        write_json_dataset(dataset_dir, ids, embeddings)
+        _, result["json_load_s"] = timed(lambda: load_legacy(dataset_dir))
+        result["json_load_s"] = round(result["json_load_s"], 3)
+        result["json_heap_peak_mb"] = heap_peak_mb(lambda: load_legacy(dataset_dir))
+    else:
+        result["json_load_s"] = result["json_heap_peak_mb"] = None
+
+    # Galerie compilée (mmap) : la première reconnaissance lit les pages du disque
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        _, compile_s = timed(lambda: gallery_store.write_gallery(ids, embeddings, dataset_dir))
+    del embeddings
+    result["compile_s"] = round(compile_s, 3)
+
+    matcher, load_s = timed(lambda: gallery_store.load_compiled_gallery(dataset_dir))
+    result["compiled_load_ms"] = round(load_s * 1000.0, 3)
+    matches, first_s = timed(lambda: matcher.match(queries, THRESHOLD))
+    result["first_match_ms"] = round(first_s * 1000.0, 3)
+    result["compiled_heap_peak_mb"] = heap_peak_mb(lambda: gallery_store.load_compiled_gallery(dataset_dir))
+
+    result["match_1_ms"] = median_ms(lambda: matcher.match(queries[:1], THRESHOLD))
+    result[f"match_{BATCH_SIZE}_ms"] = median_ms(lambda: matcher.match(queries, THRESHOLD))
+    result["match_heap_peak_mb"] = heap_peak_mb(lambda: matcher.match(queries, THRESHOLD))
+    result["hit_rate"] = round(float(np.mean([
+        match_id == ids[row] for (match_id, _), row in zip(matches, rows)
+    ])), 4)
+    return result
+
+
+def run_scaling(sizes=SIZES, output=None, json_max=JSON_MAX):
+    """Mesure toutes les tailles, affiche le tableau et l'écrit en JSON si output."""
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in sizes:
+            results.append(bench_size(count, workdir, json_max))
+            print_table(results[-1:], header=len(results) == 1)
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "host": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "dim": DIM,
+        "batch_size": BATCH_SIZE,
+        "results": results
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[BENCH] Rapport écrit dans {output}")
+    return report
+
+
+def print_table(results, header=True):
+    columns = list(results[0])
+    if header:
+        print(" | ".join(columns))
+        print(" | ".join("-" * len(column) for column in columns))
+    for result in results:
+        print(" | ".join("-" if result[c] is None else str(result[c]) for c in columns))
+
+
+def test_passage_a_l_echelle_de_la_galerie():
+    sizes = [int(size) for size in TEST_SIZES.split(",")]
+    report = run_scaling(sizes, output=os.environ.get("SCAN_BENCH_OUTPUT"))
+
+    for result in report["results"]:
+        assert result["hit_rate"] == 1.0, result
+        assert result["json_load_s"] is None or result["json_load_s"] > 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Passage à l'échelle de la galerie")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES),
+                        help="tailles de galerie, séparées par des virgules")
+    parser.add_argument("--json-max", type=int, default=JSON_MAX,
+                        help="taille max pour mesurer load_embeddings (un fichier par étudiant)")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="rapport JSON")
+    args = parser.parse_args()
+    run_scaling([int(size) for size in args.sizes.split(",")], args.output, args.json_max)
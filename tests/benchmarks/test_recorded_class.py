@@ -0,0 +1,358 @@
+# tests/benchmarks/test_recorded_class.py
+"""
+Benchmark de bout en bout du scan : des séances enregistrées sont rejouées
+dans run_face_scan (le vrai chemin de code, sans caméra ni fenêtre), contre
+une galerie de référence et une base SQLite temporaire.
+
+Données (SCAN_BENCH_DIR, par défaut tests/benchmarks/data) :
+
+    dataset/etudiant_<id>/embeddings.json   galerie de référence
+    clips/<nom>.mp4 (ou dossier d'images)   séance enregistrée
+    clips/<nom>.json                        {"students": [ids présents],
+                                             "filiere": "GI", "min_recall": 0.8}
+
+Résultats (percentiles par étape, FPS soutenus, reconnaissances par seconde,
+rappel) écrits dans SCAN_BENCH_OUTPUT (par défaut scan_benchmark.json).
+La galerie est compilée dans une copie temporaire du dataset (SCAN_BENCH_DIR
+n'est jamais modifié). Le test est ignoré sans clips ou sans les poids
+DeepFace (aucun téléchargement).
+
+Sans modèle (--stub, et toujours en CI) : une séance synthétique est rejouée
+avec une galerie générée et un détecteur factice qui « voit » les étudiants
+attendus ; tout le reste du chemin (pipeline, reconnaissance, présences,
+rapport JSON) est le vrai.
+
+    python -m pytest -q tests/benchmarks
+    python tests/benchmarks/test_recorded_class.py --fast
+    python tests/benchmarks/test_recorded_class.py --stub
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+DATA_DIR = os.environ.get("SCAN_BENCH_DIR", os.path.join(os.path.dirname(__file__), "data"))
+OUTPUT_FILE = os.environ.get("SCAN_BENCH_OUTPUT", "scan_benchmark.json")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+COURS_SESSION_ID = 1
+
+# Séance synthétique (--stub)
+STUB_STUDENTS = 40  # taille de la galerie générée
+STUB_PRESENT = 12  # étudiants « vus » par le détecteur factice
+STUB_FRAMES = 60
+STUB_FPS = 200  # cadence de la source synthétique
+STUB_DIM = 512
+STUB_NOISE = 0.05  # écart entre le visage capté et l'embedding d'inscription
+
+
+def find_clips(data_dir=DATA_DIR):
+    """Séances enregistrées : [(nom, chemin de la vidéo ou du dossier, manifeste)]."""
+    clips_dir = os.path.join(data_dir, "clips")
+    if not os.path.isdir(clips_dir):
+        return []
+
+    clips = []
+    for name in sorted(os.listdir(clips_dir)):
+        path = os.path.join(clips_dir, name)
+        stem, ext = os.path.splitext(name)
+        if not (os.path.isdir(path) or ext.lower() in VIDEO_EXTENSIONS):
+            continue
+        manifest_file = os.path.join(clips_dir, f"{stem}.json")
+        if not os.path.isfile(manifest_file):
+            continue
+        with open(manifest_file, "r") as f:
+            clips.append((stem, path, json.load(f)))
+    return clips
+
+
+def missing_weights():
+    """Poids des modèles absents du cache DeepFace (None si tout est présent)."""
+    weights_dir = os.path.join(os.environ.get("DEEPFACE_HOME", os.path.expanduser("~")),
+                               ".deepface", "weights")
+    files = os.listdir(weights_dir) if os.path.isdir(weights_dir) else []
+    if "arcface_weights.h5" not in files:
+        return "arcface_weights.h5"
+    if not any(name.startswith("yolov8") for name in files):
+        return "yolov8 (détecteur)"
+    return None
+
+
+class StubFaceBackend:
+    """
+    Détecteur + embedding factices (même interface que FacePipeline) : une
+    boîte fixe par étudiant présent, dont l'embedding est celui de la galerie
+    plus un léger bruit. Aucun modèle ni poids.
+    """
+
+    def __init__(self, embeddings, seed=0):
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.ready = True
+        self.warmup_ms = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def warmup(self):
+        return self.warmup_ms
+
+    def detect(self, frame):
+        from app.services.face_pipeline import DetectedFace
+
+        height, width = frame.shape[:2]
+        columns = 6
+        size = min(width // columns, height // 3) - 4
+        return [
+            DetectedFace((i % columns) * (size + 4), (i // columns) * (size + 4), size, size,
+                         np.array([i], dtype=np.float32), [])
+            for i in range(len(self.embeddings))
+        ]
+
+    def embed_batch(self, faces):
+        rows = [int(face[0]) for face in faces]
+        if not rows:
+            return np.empty((0, self.embeddings.shape[1]), dtype=np.float32)
+        noise = self._rng.standard_normal((len(rows), self.embeddings.shape[1]), dtype=np.float32)
+        return self.embeddings[rows] + noise * STUB_NOISE * np.abs(self.embeddings[rows]).mean()
+
+
+def write_stub_dataset(dataset_dir, count=STUB_STUDENTS, seed=0):
+    """Galerie générée : dataset/etudiant_<id>/embeddings.json, retourne {id: embedding}."""
+    rng = np.random.default_rng(seed)
+    embeddings = {}
+    for student_id in range(1, count + 1):
+        embedding = rng.standard_normal(STUB_DIM, dtype=np.float32)
+        folder = os.path.join(dataset_dir, f"etudiant_{student_id}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "embeddings.json"), "w") as f:
+            json.dump({"embedding": embedding.tolist()}, f)
+        embeddings[student_id] = embedding
+    return embeddings
+
+
+def copy_embeddings(dataset_dir, target_dir):
+    """Copie les seuls embeddings.json (pas les photos) : la galerie est compilée dans target_dir."""
+    for name in os.listdir(dataset_dir):
+        source = os.path.join(dataset_dir, name, "embeddings.json")
+        if name.startswith("etudiant_") and os.path.isfile(source):
+            os.makedirs(os.path.join(target_dir, name), exist_ok=True)
+            shutil.copy2(source, os.path.join(target_dir, name, "embeddings.json"))
+    return target_dir
+
+
+def create_bench_app(db_path):
+    """Application minimale (sans blueprints) sur une base SQLite temporaire."""
+    from flask import Flask
+    from app.config import Config
+    from app.database.connDB import db
+    from app.models import attendance, course, course_session, scan_run, student, user  # noqa: F401 (tables)
+
+    app = Flask("scan_benchmark")
+    app.config.from_object(Config)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}",
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        SCAN_HEADLESS=True,
+        SCAN_RENDER_LEVEL="off"
+    )
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_session(app, student_ids, filiere):
+    """Enseignant, cours, séance et étudiants de la galerie (nouvelle base à chaque clip)."""
+    from app.database.connDB import db
+    from app.models.course import CoursModel
+    from app.models.course_session import CoursSessionModel
+    from app.models.enum import UserRole
+    from app.models.student import EtudiantModel
+    from app.models.user import UserModel
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(UserModel(id=1, nom="Bench", prenom="Bench", email="bench@example.com",
+                                 mot_de_passe="-", role=UserRole.ENSEIGNANT.value, filiere=filiere))
+        db.session.add(CoursModel(id=1, nom="Benchmark", user_id=1, filiere=filiere, semestre="S1"))
+        db.session.add(CoursSessionModel(id=COURS_SESSION_ID, cours_id=1, date=date.today(), seance="1"))
+        for student_id in student_ids:
+            db.session.add(EtudiantModel(id=student_id, nom=f"Etudiant{student_id}", prenom="Bench",
+                                         matricule=f"BENCH{student_id}", filiere=filiere, annee="1"))
+        db.session.commit()
+
+
+def run_clip(app, name, path, manifest, realtime=True):
+    """
+    Rejoue une séance dans run_face_scan et retourne ses mesures.
+
+    Args:
+        path: vidéo ou dossier d'images, ou CaptureSpec (séance synthétique)
+    """
+    from app.services import facial_recognition
+    from app.services.capture_sources import CaptureSpec, describe
+    from app.services.scan_manager import ScanSession
+
+    if isinstance(path, CaptureSpec):
+        spec = path
+    else:
+        kind = "folder" if os.path.isdir(path) else "file"
+        options = {"realtime": realtime} if kind == "file" else ({} if realtime else {"fps": 0})
+        spec = CaptureSpec(kind, path, options)
+    session = ScanSession(COURS_SESSION_ID, headless=True, source=spec)
+
+    start = time.perf_counter()
+    detected = facial_recognition.run_face_scan_with_context(
+        COURS_SESSION_ID, headless=True, app=app, session=session
+    )
+    elapsed = time.perf_counter() - start
+
+    pipeline = session.pipeline
+    stats = pipeline.stats
+    expected = set(manifest.get("students", []))
+    found = set(detected)
+    return {
+        "clip": name,
+        "source": describe(spec),
+        "realtime": realtime,
+        "duration_s": round(elapsed, 3),
+        "frames_captured": stats.frames_captured,
+        "frames_analyzed": stats.frames_analyzed,
+        "frames_dropped": pipeline.frames_dropped,
+        "sustained_fps": round(stats.frames_captured / elapsed, 2),
+        "analyzed_fps": round(stats.frames_analyzed / elapsed, 2),
+        "recognitions_per_s": round(stats.total_detections / elapsed, 2),
+        "expected_students": sorted(expected),
+        "detected_students": sorted(found),
+        "recall": round(len(found & expected) / len(expected), 4) if expected else None,
+        "unexpected_students": sorted(found - expected),
+        "min_recall": manifest.get("min_recall"),
+        "stages": pipeline.timings.to_dict()
+    }
+
+
+def stub_clips(dataset_dir):
+    """Séance synthétique et détecteur factice (--stub) ; écrit la galerie dans dataset_dir."""
+    from app.services.capture_sources import CaptureSpec
+
+    embeddings = write_stub_dataset(dataset_dir)
+    present = sorted(embeddings)[:STUB_PRESENT]
+    spec = CaptureSpec("synthetic", None, {"width": 640, "height": 480, "fps": STUB_FPS,
+                                           "max_frames": STUB_FRAMES})
+    manifest = {"students": present, "filiere": "BENCH", "min_recall": 1.0}
+    backend = StubFaceBackend([embeddings[student_id] for student_id in present])
+    return [("synthetic", spec, manifest)], backend
+
+
+def run_benchmark(data_dir=DATA_DIR, output=OUTPUT_FILE, realtime=True, stub=False):
+    """
+    Rejoue toutes les séances de data_dir (ou la séance synthétique si stub)
+    et écrit le rapport JSON.
+    """
+    from app.services import facial_recognition, gallery_store
+    from app.services.gallery_cache import GalleryCache
+
+    results = []
+    original_cache = facial_recognition.gallery_cache
+    original_backend = facial_recognition._face_backend
+    with tempfile.TemporaryDirectory() as tmp:
+        # Galerie compilée dans une copie : data_dir reste intact
+        dataset_dir = os.path.join(tmp, "dataset")
+        os.makedirs(dataset_dir)
+        if stub:
+            clips, backend = stub_clips(dataset_dir)
+        else:
+            copy_embeddings(os.path.join(data_dir, "dataset"), dataset_dir)
+            clips, backend = find_clips(data_dir), None
+
+        gallery = GalleryCache(lambda: gallery_store.load_or_compile_gallery(dataset_dir))
+        matcher = gallery.get()[1]
+        gallery_size = len(matcher)
+        student_ids = [int(student_id) for student_id in matcher.ids]
+
+        facial_recognition.gallery_cache = gallery
+        if backend is not None:
+            facial_recognition._face_backend = backend
+        try:
+            app = create_bench_app(os.path.join(tmp, "bench.db"))
+            warmup_ms = facial_recognition.get_face_backend(app.config).warmup()
+            for name, path, manifest in clips:
+                seed_session(app, student_ids, manifest.get("filiere", "BENCH"))
+                results.append(run_clip(app, name, path, manifest, realtime))
+                print(f"[BENCH] {name}: {results[-1]['sustained_fps']} FPS, "
+                      f"rappel {results[-1]['recall']}")
+        finally:
+            facial_recognition.gallery_cache = original_cache
+            facial_recognition._face_backend = original_backend
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "host": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "model": "stub" if stub else facial_recognition.MODEL_NAME,
+        "detector": "stub" if stub else facial_recognition.DETECTOR_BACKEND,
+        "threshold": facial_recognition.THRESHOLD,
+        "gallery_size": gallery_size,
+        "warmup_ms": warmup_ms,
+        "clips": results
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[BENCH] Rapport écrit dans {output}")
+    return report
+
+
+def test_seance_synthetique_sans_modele(tmp_path):
+    pytest.importorskip("cv2")
+    output = tmp_path / "scan_benchmark.json"
+
+    report = run_benchmark(output=str(output), stub=True)
+
+    with open(output, "r") as f:
+        assert json.load(f)["clips"][0]["clip"] == "synthetic"
+    result = report["clips"][0]
+    assert result["frames_captured"] == STUB_FRAMES
+    assert result["frames_analyzed"] > 0
+    assert result["recall"] == 1.0 and result["unexpected_students"] == []
+    assert result["stages"]["detect"]["count"] > 0
+
+
+def test_seances_enregistrees():
+    if not find_clips():
+        pytest.skip(f"Aucune séance enregistrée dans {DATA_DIR}/clips")
+    missing = missing_weights()
+    if missing:
+        pytest.skip(f"Poids du modèle absents : {missing}")
+    pytest.importorskip("deepface")
+
+    report = run_benchmark()
+
+    for result in report["clips"]:
+        assert result["frames_analyzed"] > 0, result["clip"]
+        if result["min_recall"] is not None:
+            assert result["recall"] >= result["min_recall"], result["clip"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du scan sur des séances enregistrées")
+    parser.add_argument("--data", default=DATA_DIR, help="dossier dataset/ + clips/")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="rapport JSON")
+    parser.add_argument("--fast", action="store_true",
+                        help="lire les vidéos au plus vite (débit max) au lieu de leur cadence")
+    parser.add_argument("--stub", action="store_true",
+                        help="séance synthétique avec un détecteur factice (sans modèle)")
+    args = parser.parse_args()
+    run_benchmark(args.data, args.output, realtime=not args.fast, stub=args.stub)